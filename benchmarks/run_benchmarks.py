@@ -0,0 +1,213 @@
+"""效能測試：預測器、名稱映射與前處理的熱路徑
+
+每個項目記錄吞吐量、p50 / p99 延遲與峰值記憶體（tracemalloc，另跑一輪量測以免影響計時），
+結果寫成 JSON，方便比較改動前後的差異。
+
+用法：
+    python benchmarks/run_benchmarks.py                       # data/games.csv，1 倍
+    python benchmarks/run_benchmarks.py --scales 1 10 100     # 另外產生 10×、100× 合成資料
+    python benchmarks/run_benchmarks.py --only encode,predict_winrate --out before.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from predict import BPpredictor, DRAFT_COLUMNS
+import preprocessing
+from src.tools import hero_name_mapper
+from synthetic import write_dataset
+
+BENCHMARKS = ["init", "encode", "predict_winrate", "recommend_pick", "recommend_ban",
+              "translate_hero_list", "split"]
+
+
+def measure(name, fn, calls, items_per_call=1, memory_calls=None):
+    """依序執行 fn(*args) 並統計每次呼叫的延遲；峰值記憶體另外以 tracemalloc 量測"""
+    times = []
+    for args in calls:
+        start = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - start)
+    times = np.array(times)
+
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    for args in calls[:memory_calls]:
+        fn(*args)
+    peak = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+
+    return {
+        "benchmark": name,
+        "calls": len(times),
+        "items": len(times) * items_per_call,
+        "throughput_per_s": len(times) * items_per_call / times.sum(),
+        "mean_ms": times.mean() * 1000,
+        "p50_ms": float(np.percentile(times, 50)) * 1000,
+        "p99_ms": float(np.percentile(times, 99)) * 1000,
+        "peak_mem_mb": peak / 2**20,
+    }
+
+
+def sample_drafts(model, games_df, n, seed):
+    """從真實比賽中擷取 BP 進行到一半的陣容"""
+    rng = random.Random(seed)
+    rows = games_df.sample(n=n, replace=True, random_state=seed)
+    drafts = []
+    for _, r in rows.iterrows():
+        draft = {}
+        for col in DRAFT_COLUMNS:
+            lst = model.parse_list_field(r[col])
+            draft[col] = lst[:rng.randint(0, len(lst))]
+        drafts.append(draft)
+    return drafts
+
+
+def display_path(path):
+    rel = os.path.relpath(path, ROOT)
+    return path if rel.startswith("..") else rel
+
+
+def quiet(fn, *args, **kwargs):
+    # BPpredictor 建構時會印出整個英雄列表
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(*args, **kwargs)
+
+
+def ensure_model(path, games_df, tmp):
+    if path and os.path.exists(path):
+        return path
+    print(f"找不到模型 {path}，以 {len(games_df)} 場訓練一個 50 輪的模型供測試")
+    model = quiet(BPpredictor, games_df.copy(), pd.DataFrame())
+    out = os.path.join(tmp, "bench.model.json")
+    quiet(model.train, games_df, num_boost_round=50, cache_dir=None, model_path=out, verbose_eval=False)
+    return out
+
+
+def bench_dataset(games_path, match_path, model_path, scale, selected, args, tmp):
+    games_df = pd.read_csv(games_path)
+    results = []
+    info = {"dataset": display_path(games_path), "scale": scale, "games": len(games_df)}
+
+    def add(result):
+        result.update(info)
+        results.append(result)
+        print(f"  {result['benchmark']:<20} p50 {result['p50_ms']:9.3f} ms  p99 {result['p99_ms']:9.3f} ms  "
+              f"{result['throughput_per_s']:12.1f}/s  peak {result['peak_mem_mb']:8.1f} MB")
+
+    if "init" in selected:
+        repeat = 3 if scale == 1 else 1
+        add(measure("init", lambda: quiet(BPpredictor, games_df.copy(), pd.DataFrame(), modelName=model_path),
+                    [()] * repeat, items_per_call=len(games_df), memory_calls=1))
+
+    model = quiet(BPpredictor, games_df.copy(), pd.DataFrame(), modelName=model_path, cache_size=0)
+    drafts = sample_drafts(model, games_df, args.calls, args.seed)
+    if "encode" in selected:
+        add(measure("encode", model.encode, [(d,) for d in drafts], memory_calls=100))
+    if "predict_winrate" in selected:
+        add(measure("predict_winrate", model.predict_winrate, [(dict(d),) for d in drafts], memory_calls=100))
+    few = drafts[:max(1, args.calls // 5)]
+    if "recommend_pick" in selected:
+        add(measure("recommend_pick", model.recommend_pick, [(dict(d),) for d in few], memory_calls=20))
+    if "recommend_ban" in selected:
+        add(measure("recommend_ban", model.recommend_ban, [(dict(d),) for d in few], memory_calls=20))
+
+    if "split" in selected and match_path:
+        out_games, out_heroes = os.path.join(tmp, "games.csv"), os.path.join(tmp, "heroes.csv")
+        rows = sum(1 for _ in open(match_path, encoding="utf-8")) - 1
+        add(measure("split", lambda: preprocessing.split(match_path, out_games, out_heroes, chunksize=120000),
+                    [()] * (3 if scale == 1 else 1), items_per_call=rows // preprocessing.ROWS_PER_GAME,
+                    memory_calls=1))
+    return results
+
+
+def bench_mapper(names_path, args):
+    hero_name_mapper.load_hero_names(names_path)
+    with open(names_path, encoding="utf-8") as f:
+        data = json.load(f)
+    # 英文名稱、中文別名與未知名稱混合
+    pool = list(data) + [alias for aliases in data.values() for alias in aliases] + ["未知英雄", "xyz"]
+    rng = random.Random(args.seed)
+    calls = [([rng.choice(pool) for _ in range(5)],) for _ in range(args.calls * 2)]
+    result = measure("translate_hero_list", hero_name_mapper.translate_hero_list, calls,
+                     items_per_call=5, memory_calls=200)
+    result.update({"dataset": display_path(names_path), "scale": 1, "games": None})
+    print(f"  {result['benchmark']:<20} p50 {result['p50_ms']:9.3f} ms  p99 {result['p99_ms']:9.3f} ms  "
+          f"{result['throughput_per_s']:12.1f}/s  peak {result['peak_mem_mb']:8.1f} MB")
+    return [result]
+
+
+def metadata():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    versions = {"python": platform.python_version(), "numpy": np.__version__, "pandas": pd.__version__}
+    try:
+        import xgboost
+        versions["xgboost"] = xgboost.__version__
+    except ImportError:
+        pass
+    return {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "commit": commit, "platform": platform.platform(),
+            "cpus": os.cpu_count(), "versions": versions}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="預測器、名稱映射與前處理的效能測試")
+    parser.add_argument("--games", default=os.path.join(ROOT, "data", "games.csv"))
+    parser.add_argument("--hero-names", default=os.path.join(ROOT, "data", "HeroNames.txt"))
+    parser.add_argument("--model", default=os.path.join(ROOT, "bp_predictor.model"),
+                        help="不存在時以資料訓練一個小模型")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1], help="資料放大倍數，例如 1 10 100")
+    parser.add_argument("--data-dir", default=os.path.join(ROOT, "benchmarks", ".data"), help="合成資料存放目錄")
+    parser.add_argument("--only", help=f"逗號分隔的項目：{','.join(BENCHMARKS)}")
+    parser.add_argument("--calls", type=int, default=1000, help="每個單筆項目的呼叫次數")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=os.path.join(ROOT, "benchmarks", "results.json"))
+    args = parser.parse_args()
+
+    selected = set(args.only.split(",")) if args.only else set(BENCHMARKS)
+    unknown = selected - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"未知的項目: {', '.join(sorted(unknown))}")
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = ensure_model(args.model, pd.read_csv(args.games), tmp)
+        for scale in args.scales:
+            games_path, match_path = write_dataset(args.games, scale, args.data_dir, seed=args.seed,
+                                                   match_data="split" in selected)
+            print(f"[{scale}×] {games_path}")
+            results += bench_dataset(games_path, match_path, model_path, scale, selected, args, tmp)
+        if "translate_hero_list" in selected:
+            print("[mapper]")
+            results += bench_mapper(args.hero_names, args)
+
+    report = {"meta": metadata(), "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+              "results": results}
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"結果已寫出到 {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""產生放大的合成資料，供效能測試使用
+
+以真實的 games.csv 為樣本複製 factor 倍：每份複本重新編號 game_id、隨機交換藍紅方並打亂 pick 順序，
+英雄分佈與原始資料相近但統計不會完全相同。也可以轉成 preprocessing.split 需要的原始逐筆格式。
+
+用法：python benchmarks/synthetic.py data/games.csv 10 benchmarks/.data
+"""
+import ast
+import os
+import re
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from preprocessing import BAN_COLS, PICK_COLS
+
+POSITIONS = ["top", "jng", "mid", "bot", "sup"]
+LIST_COLS = ["team1_picks", "team2_picks", "team1_bans", "team2_bans"]
+
+
+def _parse(x):
+    if isinstance(x, list):
+        return x
+    # 缺 ban 時 preprocessing 會寫出未加引號的 nan
+    return [np.nan if v is None else v for v in ast.literal_eval(re.sub(r"\bnan\b", "None", str(x)))]
+
+
+def scale_games(games_df, factor, seed=0):
+    """回傳 factor 倍大小的比賽資料（第一份為原始資料）"""
+    rng = np.random.default_rng(seed)
+    games_df = games_df.copy()
+    for col in LIST_COLS:
+        games_df[col] = games_df[col].apply(_parse)
+    parts = [games_df]
+    for i in range(1, factor):
+        copy = games_df.copy()
+        copy["game_id"] = copy["game_id"].astype(str) + f"-s{i}"
+        swap = rng.random(len(copy)) < 0.5
+        for a, b in (("team1_picks", "team2_picks"), ("team1_bans", "team2_bans")):
+            left, right = copy[a].copy(), copy[b].copy()
+            copy.loc[swap, a] = right[swap]
+            copy.loc[swap, b] = left[swap]
+        # team1 固定是藍方，交換兩隊後勝方也要跟著換
+        winner = copy["winner"].astype(str)
+        copy.loc[swap, "winner"] = np.where(winner[swap].str.lower() == "blue", "Red", "Blue")
+        for col in ("team1_picks", "team2_picks"):
+            copy[col] = [[lst[j] for j in rng.permutation(len(lst))] for lst in copy[col]]
+        parts.append(copy)
+    return pd.concat(parts, ignore_index=True)
+
+
+def games_to_match_data(games_df):
+    """轉成原始逐筆格式：每場 10 筆選手資料 + 2 筆隊伍資料（ban / pick）"""
+    rows = []
+    for g in games_df.itertuples(index=False):
+        t1_win = 1 if str(g.winner).lower() == "blue" else 0
+        sides = (("Blue", g.team1_picks, g.team1_bans, t1_win), ("Red", g.team2_picks, g.team2_bans, 1 - t1_win))
+        base = {"gameid": g.game_id, "patch": g.patch, "league": g.league}
+        for side, picks, _, result in sides:
+            for pos, champ in zip(POSITIONS, picks):
+                rows.append({**base, "side": side, "position": pos, "champion": champ, "result": result})
+        for side, picks, bans, result in sides:
+            row = {**base, "side": side, "position": "team", "champion": np.nan, "result": result}
+            row.update(zip(BAN_COLS, list(bans) + [np.nan] * (5 - len(bans))))
+            row.update(zip(PICK_COLS, list(picks) + [np.nan] * (5 - len(picks))))
+            rows.append(row)
+    columns = ["gameid", "patch", "league", "side", "position", "champion", "result"]
+    columns += [c for pair in zip(BAN_COLS, PICK_COLS) for c in pair]
+    return pd.DataFrame(rows, columns=columns)
+
+
+def write_dataset(games_path, factor, out_dir, seed=0, match_data=True):
+    """寫出 games_x{factor}.csv（及 match_data_x{factor}.csv），已存在時直接沿用；回傳路徑"""
+    os.makedirs(out_dir, exist_ok=True)
+    games_out = os.path.join(out_dir, f"games_x{factor}.csv")
+    match_out = os.path.join(out_dir, f"match_data_x{factor}.csv")
+    need_games = not os.path.exists(games_out)
+    need_match = match_data and not os.path.exists(match_out)
+    if need_games or need_match:
+        games = scale_games(pd.read_csv(games_path), factor, seed)
+        if need_games:
+            games.to_csv(games_out, index=False)
+        if need_match:
+            games_to_match_data(games).to_csv(match_out, index=False)
+    return games_out, (match_out if match_data else None)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(1)
+    out_dir = sys.argv[3] if len(sys.argv) > 3 else os.path.join(os.path.dirname(__file__), ".data")
+    paths = write_dataset(sys.argv[1], int(sys.argv[2]), out_dir)
+    print("已寫出:", ", ".join(p for p in paths if p))
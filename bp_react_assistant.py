@@ -5,7 +5,7 @@ import os
 # 添加項目路徑
 sys.path.insert(0, os.path.dirname(__file__))
 
-from src.agent.bp_react_agent import run_bp_react
+from src.agent.bp_react_agent import run_bp_react, warm_up, set_answer_mode, get_answer_mode, ANSWER_MODES
 from src.tools.hero_name_mapper import load_hero_names
 
 
@@ -18,6 +18,7 @@ def main():
     print("- '當前陣容是藍隊選了 Neeko, Trundle，紅隊選了 Xin Zhao, Taliyah，請預測勝率'")
     print("- '藍隊應該選誰？'")
     print("- '推薦紅隊應該 ban 誰'")
+    print("- '輸入 /template 或 /llm 切換回答方式（模板 / LLM 總結）'")
     print("- '輸入 quit 或 exit 退出'\n")
     
     # 載入映射表
@@ -28,6 +29,9 @@ def main():
         print(f"✗ 載入英雄名稱映射失敗: {e}\n")
         return
     
+    # 使用者輸入第一個問題時，模型已在背景載入
+    warm_up()
+    
     while True:
         try:
             user_input = input("請輸入您的問題: ").strip()
@@ -39,6 +43,11 @@ def main():
             if not user_input:
                 continue
             
+            if user_input.startswith("/") and user_input[1:] in ANSWER_MODES:
+                set_answer_mode(user_input[1:])
+                print(f"回答方式：{get_answer_mode()}\n")
+                continue
+            
             # 使用 ReAct Agent 處理
             result = run_bp_react(user_input)
             print(f"\n{result}\n")
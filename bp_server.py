@@ -0,0 +1,243 @@
+"""BP 預測 HTTP 服務（asyncio）
+
+透過模型註冊表取得 BPpredictor，提供 /predict、/recommend_pick、/recommend_ban。
+短時間內同時到達的請求會合併成一次模型推論（micro-batching）。
+
+用法: python bp_server.py --port 8000 --max-batch 32 --max-wait-ms 5
+
+請求為 POST JSON，參數與 src/tools/bp_predictor.py 的工具函數相同，例如：
+    {"team1_picks": ["妮可"], "team2_picks": ["趙信", "岩雀"], "team": "blue"}
+可另外指定 "patch_range"（如 "15.01-15.04"）與 "leagues"，與工具函數一樣選用對應的模型與統計。
+"""
+import argparse
+import asyncio
+import json
+import sys
+import os
+
+import numpy as np
+
+# 添加項目路徑
+sys.path.insert(0, os.path.dirname(__file__))
+
+from src.tools.hero_name_mapper import load_hero_names
+from src.tools.bp_predictor import get_model, model_info, translate_drafts
+
+
+class MicroBatcher:
+    """把短時間內送來的特徵矩陣合併成一次 predict
+
+    第一筆請求到達後最多等待 max_wait 秒，或累積到 max_batch 個請求就送出。
+    每個請求附帶要使用的模型推論函數，同一批中使用相同模型的請求合併推論。
+    推論在執行緒中進行，不會阻塞事件迴圈。
+    """
+
+    def __init__(self, max_batch=32, max_wait=0.005):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.batches = 0
+        self.requests = 0
+        self._queue = None
+        self._worker = None
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def submit(self, X, predict_fn):
+        """送出 (n, F) 特徵矩陣與模型的推論函數，回傳長度 n 的預測值"""
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((X, predict_fn, fut))
+        return await fut
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            jobs = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(jobs) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    jobs.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            groups = {}
+            for job in jobs:
+                groups.setdefault(job[1], []).append(job)
+            for predict_fn, group in groups.items():
+                X = np.concatenate([x for x, _, _ in group]) if len(group) > 1 else group[0][0]
+                try:
+                    preds = await loop.run_in_executor(None, predict_fn, X)
+                except Exception as e:
+                    for _, _, fut in group:
+                        if not fut.done():
+                            fut.set_exception(e)
+                    continue
+                self.batches += 1
+                self.requests += len(group)
+                start = 0
+                for x, _, fut in group:
+                    if not fut.done():
+                        fut.set_result(preds[start:start + len(x)])
+                    start += len(x)
+
+    def stats(self):
+        return {"batches": self.batches, "requests": self.requests,
+                "max_batch": self.max_batch, "max_wait_ms": self.max_wait * 1000}
+
+
+class BPService:
+    """HTTP 路由與請求處理"""
+
+    STATUS = {200: "200 OK", 400: "400 Bad Request", 404: "404 Not Found",
+              405: "405 Method Not Allowed", 500: "500 Internal Server Error"}
+
+    def __init__(self, get_model=get_model, max_batch=32, max_wait=0.005):
+        self.get_model = get_model
+        self.batcher = MicroBatcher(max_batch=max_batch, max_wait=max_wait)
+        self.routes = {
+            "/predict": self.predict,
+            "/recommend_pick": self.recommend_pick,
+            "/recommend_ban": self.recommend_ban,
+        }
+
+    @staticmethod
+    def _draft(args):
+        return translate_drafts([args])[0]
+
+    async def _models(self, args):
+        """依 patch_range / leagues 取得註冊表中的模型與其統計視圖
+
+        模型可能需要從快照載入、視圖可能需要建立，因此在執行緒中進行。
+        視圖與模型共用 Booster，推論交給模型本身，不同統計的請求仍可合併成一批。
+        """
+        patch_range, leagues = args.get("patch_range"), args.get("leagues")
+
+        def resolve():
+            model = self.get_model(patch_range, leagues)
+            return model, model.stats_view(patch_range, leagues)
+        return await asyncio.get_running_loop().run_in_executor(None, resolve)
+
+    async def predict(self, args):
+        data = self._draft(args)
+        team = args.get("team", "blue")
+        model, view = await self._models(args)
+        key = view.draft_key(data)
+        winrate = view.winrate_cache.get(key)
+        if winrate is None:
+            X = view.encode(data).reshape(1, -1)
+            winrate = float((await self.batcher.submit(X, model.predict_features))[0])
+            view.winrate_cache.put(key, winrate)
+        if team == "red":
+            winrate = 1 - winrate
+        return {"winrate": winrate, "team": team, "translated_data": data}
+
+    async def _recommend(self, args, kind, team):
+        data = self._draft(args)
+        model, view = await self._models(args)
+        legal, pick_col, flip = view._recommend_setup(data, kind, team)
+        if not legal:
+            return {"recommendations": [], "translated_data": data}
+        loop = asyncio.get_running_loop()
+        X = await loop.run_in_executor(None, view.encode_candidates, data, pick_col, legal)
+        winrates = await self.batcher.submit(X, model.predict_features)
+        ranked = view._rank_candidates(legal, winrates, flip, int(args.get("top_k", 5)))
+        return {"recommendations": ranked, "translated_data": data}
+
+    async def recommend_pick(self, args):
+        return await self._recommend(args, "pick", args.get("team", "blue"))
+
+    async def recommend_ban(self, args):
+        return await self._recommend(args, "ban", args.get("target_team", args.get("team", "red")))
+
+    async def dispatch(self, method, path, body):
+        if path == "/stats" and method == "GET":
+            return 200, {"batcher": self.batcher.stats(), "cache": self.get_model().cache_info(),
+                         "models": model_info()}
+        handler = self.routes.get(path)
+        if handler is None:
+            return 404, {"error": f"未知的路徑: {path}"}
+        if method != "POST":
+            return 405, {"error": "只接受 POST"}
+        try:
+            args = json.loads(body or b"{}")
+            if not isinstance(args, dict):
+                raise ValueError("請求內容必須是 JSON 物件")
+        except ValueError as e:
+            return 400, {"error": f"無法解析請求: {e}"}
+        try:
+            return 200, await handler(args)
+        except Exception as e:
+            return 500, {"error": f"處理失敗: {e}"}
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, value = line.decode("latin-1").split(":", 1)
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                status, payload = await self.dispatch(method, path.split("?", 1)[0], body)
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                writer.write((f"HTTP/1.1 {self.STATUS[status]}\r\n"
+                              "Content-Type: application/json; charset=utf-8\r\n"
+                              f"Content-Length: {len(data)}\r\n\r\n").encode("latin-1") + data)
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8000):
+        self.batcher.start()
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"BP 服務啟動於 http://{host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.batcher.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="BP 預測 HTTP 服務")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-batch", type=int, default=32, help="一次推論最多合併幾個請求")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0, help="第一個請求最多等待多久再送出")
+    args = parser.parse_args()
+
+    load_hero_names()
+    get_model()  # 啟動時先載入預設模型
+    service = BPService(get_model, max_batch=args.max_batch, max_wait=args.max_wait_ms / 1000)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("\n服務已停止")
+
+
+if __name__ == '__main__':
+    main()
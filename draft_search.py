@@ -0,0 +1,174 @@
+"""完整 BP 流程的前瞻搜尋（beam search + 深度限制 minimax）"""
+import time
+
+from predict import BPpredictor, DRAFT_COLUMNS
+
+# 職業賽 20 步 BP 順序：每一步填入的欄位
+DRAFT_ORDER = [
+    'team1_bans', 'team2_bans', 'team1_bans', 'team2_bans', 'team1_bans', 'team2_bans',
+    'team1_picks', 'team2_picks', 'team2_picks', 'team1_picks', 'team1_picks', 'team2_picks',
+    'team2_bans', 'team1_bans', 'team2_bans', 'team1_bans',
+    'team2_picks', 'team1_picks', 'team1_picks', 'team2_picks',
+]
+
+class _Timeout(Exception):
+    pass
+
+
+class DraftSearch:
+    """在 BP 順序上做前瞻搜尋
+
+    藍隊（team1）最大化 team1 勝率，紅隊最小化。每個節點用一次批次預測為所有合法英雄打分，
+    只展開前 beam_width 名；ban 依「對手拿到該英雄時，對手的勝率」由高到低排序（對手越強越先 ban）。
+    注意這與 BPpredictor.recommend_ban 的排序相反：後者模擬 target_team 拿到該英雄，依 team1 勝率由高到低排列。
+    置換表以 BPpredictor.draft_key（pick 保留順序、ban 視為集合）加上剩餘深度為鍵；
+    換掉 model 或模型 / 統計更新（BPpredictor.version 改變）後，下次搜尋前會自動清空。
+    """
+
+    def __init__(self, model: BPpredictor, order=None, beam_width=5, max_table_size=200000):
+        self.model = model
+        self.order = list(order or DRAFT_ORDER)
+        self.beam_width = beam_width
+        self.max_table_size = max_table_size
+        self._table = {}
+        self._table_owner = None  # 置換表內容來自哪個 (模型, 版本)
+        self._deadline = None
+        self.nodes = 0
+        self.table_hits = 0
+        self.predict_calls = 0
+
+    def clear(self):
+        self._table.clear()
+        self._table_owner = None
+
+    def _check_table(self):
+        owner = self._table_owner
+        if owner is None or owner[0] is not self.model or owner[1] != self.model.version:
+            self._table.clear()
+            self._table_owner = (self.model, self.model.version)
+
+    def search(self, data, depth=4, time_budget=None):
+        """從目前陣容往後搜尋
+
+        Args:
+            data: 目前陣容（team1_picks / team2_picks / team1_bans / team2_bans）
+            depth: 最多往後看幾步
+            time_budget: 秒數；提供時改用逐步加深，回傳時間內完成的最深結果
+
+        Returns:
+            {"winrate": 最佳路線結束時的 team1 勝率, "line": [(欄位, 英雄), ...], "depth": 完成的深度}
+        """
+        self._check_table()
+        state = {c: self.model.parse_list_field(data.get(c, [])) for c in DRAFT_COLUMNS}
+        step = sum(len(state[c]) for c in DRAFT_COLUMNS)
+        if step > len(self.order):
+            raise ValueError(f"陣容已超過 BP 順序長度: {step} > {len(self.order)}")
+        depth = min(depth, len(self.order) - step)
+
+        if time_budget is None:
+            self._deadline = None
+            value, line = self._value(state, step, depth)
+            return {"winrate": value, "line": line, "depth": depth}
+
+        # 逐步加深；深度 1 一定會完成，之後超過時間就回傳上一個完整結果
+        deadline = time.perf_counter() + time_budget
+        self._deadline = None
+        best = None
+        try:
+            for d in range(1, depth + 1):
+                try:
+                    value, line = self._value(state, step, d)
+                except _Timeout:
+                    break
+                best = {"winrate": value, "line": line, "depth": d}
+                self._deadline = deadline
+        finally:
+            self._deadline = None
+        if best is None:
+            best = {"winrate": self._leaf(state), "line": [], "depth": 0}
+        return best
+
+    def _leaf(self, state):
+        self.predict_calls += 1
+        return self.model.predict_winrate(dict(state))
+
+    def _legal(self, state):
+        taken = set()
+        for c in DRAFT_COLUMNS:
+            taken.update(self.model.hero_to_idx[h] for h in state[c] if h in self.model.hero_to_idx)
+        return [hid for hid in range(self.model.num_heroes) if hid not in taken]
+
+    def _score(self, state, col, hero_ids):
+        self.predict_calls += 1
+        return self.model._score_candidates(state, col, hero_ids)
+
+    def _expand(self, state, col, exact):
+        """回傳 (候選英雄索引, team1 勝率或 None)；exact 時附上子節點的實際評估值"""
+        legal = self._legal(state)
+        if not legal:
+            return [], None
+        blue = col.startswith('team1')
+        if col.endswith('_picks'):
+            winrate = self._score(state, col, legal)
+            gain = winrate if blue else 1 - winrate
+            top = sorted(range(len(legal)), key=lambda i: gain[i], reverse=True)[:self.beam_width]
+            return [legal[i] for i in top], ([float(winrate[i]) for i in top] if exact else None)
+
+        # ban：假設對手拿到該英雄，對手勝率越高越該 ban
+        opp_col = 'team2_picks' if blue else 'team1_picks'
+        winrate = self._score(state, opp_col, legal)
+        threat = 1 - winrate if blue else winrate
+        top = sorted(range(len(legal)), key=lambda i: threat[i], reverse=True)[:self.beam_width]
+        hero_ids = [legal[i] for i in top]
+        if not exact:
+            return hero_ids, None
+        return hero_ids, [float(v) for v in self._score(state, col, hero_ids)]
+
+    def _value(self, state, step, depth):
+        if self._deadline is not None and time.perf_counter() > self._deadline:
+            raise _Timeout()
+        if depth == 0 or step >= len(self.order):
+            return self._leaf(state), []
+
+        key = (self.model.draft_key(state), depth)
+        if key in self._table:
+            self.table_hits += 1
+            return self._table[key]
+        self.nodes += 1
+
+        col = self.order[step]
+        blue = col.startswith('team1')
+        hero_ids, values = self._expand(state, col, exact=(depth == 1))
+        if not hero_ids:
+            return self._leaf(state), []
+
+        best = None
+        for i, hid in enumerate(hero_ids):
+            hero = self.model.idx_to_hero[hid]
+            if values is not None:
+                value, line = values[i], []
+            else:
+                child = dict(state)
+                child[col] = state[col] + [hero]
+                value, line = self._value(child, step + 1, depth - 1)
+            if best is None or (value > best[0] if blue else value < best[0]):
+                best = (value, [(col, hero)] + line)
+
+        if len(self._table) >= self.max_table_size:
+            self._table.clear()
+        self._table[key] = best
+        return best
+
+
+if __name__ == '__main__':
+    model = BPpredictor.from_csv("games.csv", "heroes.csv", modelName="bp_predictor.model",
+                                 snapshot_path="bp_predictor.snapshot.npz")
+    engine = DraftSearch(model, beam_width=5)
+    data = {c: [] for c in DRAFT_COLUMNS}
+    for step, col in enumerate(DRAFT_ORDER):
+        result = engine.search(data, depth=4, time_budget=2.0)
+        col, hero = result["line"][0]
+        data[col].append(hero)
+        print(f"[{step+1:2d}] {col}: {hero}  (深度 {result['depth']}, 預期勝率 {result['winrate']:.4f})")
+    print(data)
+    print("勝率:", model.predict_winrate(data))
@@ -1,15 +1,188 @@
+import copy
+import hashlib
+import os
+import re
+import threading
+import time
 import pandas as pd
 import numpy as np
-from collections import defaultdict
-from sklearn.model_selection import train_test_split
+from collections import defaultdict, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from sklearn.model_selection import StratifiedKFold, train_test_split
 from sklearn.metrics import accuracy_score, roc_auc_score
-import xgboost as xgb
+try:
+    import xgboost as xgb
+except ImportError:  # 只用匯出的樹模型（.npz）推論時不需要 xgboost
+    xgb = None
+
+from tree_ensemble import TreeEnsemble
+
+DRAFT_COLUMNS = ['team1_picks', 'team2_picks', 'team1_bans', 'team2_bans']
+
+SNAPSHOT_VERSION = 3  # 快照格式變更時遞增，舊快照會自動失效
+
+
+def hash_files(paths):
+    """計算多個來源檔案的 sha256，用來判斷快照是否過期"""
+    h = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+    return h.hexdigest()
+
+
+def patch_key(patch):
+    """patch 標準化為兩位小數的浮點數（"15.01" 與 15.01 相同，15.1 代表 15.10）；無法解析時回傳 nan"""
+    try:
+        return round(float(patch), 2)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def parse_patch_range(patches):
+    """解析 patch 區間：None、單一 patch、(lo, hi) 或 "15.01-15.04" 字串，回傳 (lo, hi)，None 表示不限"""
+    if patches is None:
+        return None, None
+    if isinstance(patches, str):
+        parts = [p.strip() for p in re.split(r"\s*[-–~]\s*|\s+to\s+", patches.strip()) if p.strip()]
+    elif isinstance(patches, (list, tuple)):
+        parts = list(patches)
+    else:
+        parts = [patches]
+    if len(parts) == 1:
+        parts = parts * 2
+    if len(parts) != 2:
+        raise ValueError(f"無法解析 patch 區間: {patches}")
+    lo, hi = [None if p is None or p == '' else patch_key(p) for p in parts]
+    if (lo is not None and np.isnan(lo)) or (hi is not None and np.isnan(hi)):
+        raise ValueError(f"無法解析 patch 區間: {patches}")
+    return lo, hi
+
+
+class PatchStatsCube:
+    """patch × hero × hero 的累積場數張量（counts_vs / wins_vs / counts_sy / wins_sy）
+
+    cum[k] 為前 k+1 個 patch 的總和，任意連續 patch 區間的統計只需兩個前綴相減，O(N²)。
+    """
+
+    def __init__(self, patches, counts):
+        self.patches = np.asarray(patches, dtype=np.float64)  # 已排序
+        self.cum = [np.cumsum(c, axis=0, dtype=np.int32) for c in counts]
+
+    def range_counts(self, lo=None, hi=None):
+        i = 0 if lo is None else int(np.searchsorted(self.patches, lo, 'left'))
+        j = len(self.patches) if hi is None else int(np.searchsorted(self.patches, hi, 'right'))
+        if j <= i:
+            return tuple(np.zeros(c.shape[1:], dtype=np.int32) for c in self.cum)
+        return tuple(c[j-1] - c[i-1] if i > 0 else c[j-1].copy() for c in self.cum)
+
+    @property
+    def nbytes(self):
+        return sum(c.nbytes for c in self.cum)
+
+
+class LRUCache:
+    """有容量上限的 LRU 快取，並記錄命中 / 未命中 / 淘汰次數；可由多個執行緒共用"""
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def values(self):
+        with self._lock:
+            return list(self._data.values())
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._data), "maxsize": self.maxsize,
+                    "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+    def __len__(self):
+        return len(self._data)
+
+    # 鎖無法 pickle（cross_validate 會把預測器送進子行程），還原時重新建立
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+
 class BPpredictor:
     PICK_WEIGHTS = np.array([1/1,1/2,1/3,1/4,1/5])  # 可調
-    def __init__(self, games_df, hero_df,modelName = None):
-        if modelName!= None: 
-            self.model = xgb.Booster()
-            self.model.load_model(modelName)
+    SMALL_BATCH = 16  # 少於此筆數時逐筆編碼，避免向量化的固定開銷
+    CACHE_SIZE = 4096  # predict_winrate 快取的預設筆數上限，0 表示停用
+    FAST_MAX_ROWS = 256  # 不超過此筆數時用 NumPy 走訪樹（TreeEnsemble），0 表示一律用 Booster
+    CUBE_CACHE_SIZE = 4  # 最多保留幾個 league 組合的 patch 累積張量（每個約 P*N*N*16 bytes）
+    VIEW_CACHE_SIZE = 16  # 最多保留幾個 patch 區間的統計視圖
+    GAMES_TABLE_KEYS = ('team1', 'team2', 'win', 'patch', 'league')  # 快照中 games_* 欄位
+    def __init__(self, games_df, hero_df,modelName = None, cache_size=None, cache_mirror=False):
+        self._init_cache(cache_size, cache_mirror)
+        self._load_model(modelName)
+        games_df = self._prepare_games(games_df)
+
+        self.all_heroes = self._heroes_in(games_df)
+        self._set_heroes(self.all_heroes)
+        print(self.all_heroes)
+        print("英雄數量:", self.num_heroes)
+        
+        """
+        hero_df = hero_df[hero_df['is_pick']==1][['role','champion']]
+        self.hero_to_pos = {h: p for p, h in enumerate(self.all_heroes)}
+        self.pos_to_hero = {p: h for h, p in self.hero_to_idx.items()}
+        """
+        
+        # 已計入統計的比賽，ingest 時用來略過重複資料
+        self.game_ids = set(self._game_id_keys(games_df['game_id']).dropna()) if 'game_id' in games_df.columns else set()
+        # 以整數編碼保留每場的 pick / 勝負 / patch / league，供 patch 區間統計使用
+        self.games_table = self._encode_games(games_df)
+        self._set_counts(*self._table_counts(self.games_table))
+
+    @staticmethod
+    def normalize_winner(w):
+        # normalize winner field to 1 if team1 won else 0
+        if pd.isna(w):
+            return np.nan
+        w = str(w).lower()
+        if w in ['team1','1','true','t','yes','win','won','blue']:
+            return 1
+        else:
+            return 0
+
+    def _prepare_games(self, games_df):
         # parse columns
         for col in ['team1_picks','team2_picks','team1_bans','team2_bans','winner','patch','league']:
             if col not in games_df.columns:
@@ -18,86 +191,403 @@ class BPpredictor:
         games_df['team2_picks'] = games_df['team2_picks'].apply(self.parse_list_field)
         games_df['team1_bans']  = games_df['team1_bans'].apply(self.parse_list_field)
         games_df['team2_bans']  = games_df['team2_bans'].apply(self.parse_list_field)
-        
-        
-        # normalize winner field to 1 if team1 won else 0
-        def normalize_winner(w):
-            if pd.isna(w):
-                return np.nan
-            w = str(w).lower()
-            if w in ['team1','1','true','t','yes','win','won','blue']:
-                return 1
-            else:
-                return 0
-        games_df['label_team1_win'] = games_df['winner'].apply(normalize_winner)
+        games_df['label_team1_win'] = games_df['winner'].apply(self.normalize_winner)
 
         # drop rows without proper picks or labels
         games_df = games_df[games_df['team1_picks'].apply(len) >= 1]
         games_df = games_df[games_df['team2_picks'].apply(len) >= 1]
-        games_df = games_df[~games_df['label_team1_win'].isna()].reset_index(drop=True)
+        return games_df[~games_df['label_team1_win'].isna()].reset_index(drop=True)
 
-        
-        self.all_heroes = set()
-        for _, r in games_df.iterrows():
-            self.all_heroes.update(r['team1_picks'])
-            self.all_heroes.update(r['team2_picks'])
-            self.all_heroes.update(r['team1_bans'])
-            self.all_heroes.update(r['team2_bans'])
-        
-        self.all_heroes = sorted([h for h in self.all_heroes if h and h.lower() != 'nan'])
-        
+    @staticmethod
+    def _heroes_in(games_df):
+        heroes = set()
+        for col in DRAFT_COLUMNS:
+            for lst in games_df[col]:
+                heroes.update(lst)
+        return sorted([h for h in heroes if isinstance(h, str) and h and h.lower() != 'nan'])
+
+    def _encode_games(self, games_df):
+        # 先把 pick 欄位轉成整數索引矩陣（-1 為空位），之後所有統計都從這裡累加
+        t1, m1, _ = self._index_batch(games_df['team1_picks'])
+        t2, m2, _ = self._index_batch(games_df['team2_picks'])
+        return {
+            'team1': np.where(m1, t1, -1).astype(np.int32),
+            'team2': np.where(m2, t2, -1).astype(np.int32),
+            'win': games_df['label_team1_win'].to_numpy().astype(np.int64),
+            'patch': np.array([patch_key(p) for p in games_df['patch']], dtype=np.float64),
+            'league': games_df['league'].astype(str).to_numpy(dtype=str),
+        }
+
+    @staticmethod
+    def _concat_games(a, b):
+        out = {}
+        for k in ('team1', 'team2'):
+            width = max(a[k].shape[1], b[k].shape[1])
+            pad = lambda x: np.pad(x, ((0, 0), (0, width - x.shape[1])), constant_values=-1)
+            out[k] = np.vstack([pad(a[k]), pad(b[k])])
+        for k in ('win', 'patch', 'league'):
+            out[k] = np.concatenate([a[k], b[k]])
+        return out
+
+    def _table_counts(self, table, rows=None, group=None, num_groups=None):
+        t1, t2, win = table['team1'], table['team2'], table['win']
+        if rows is not None:
+            t1, t2, win = t1[rows], t2[rows], win[rows]
+        return self._pair_counts(t1, t1 >= 0, t2, t2 >= 0, win, group=group, num_groups=num_groups)
+
+    def _init_cache(self, cache_size=None, cache_mirror=False):
+        # cache_mirror: 同時記錄左右互換後的陣容為 1-p；模型本身並非左右對稱，因此預設關閉
+        self.winrate_cache = LRUCache(self.CACHE_SIZE if cache_size is None else cache_size)
+        self.cache_mirror = cache_mirror
+        # patch 區間統計：累積張量與各區間的預測器視圖；統計變動時一併清空
+        self.stats_range = None
+        self._cubes = LRUCache(self.CUBE_CACHE_SIZE)
+        self._views = LRUCache(self.VIEW_CACHE_SIZE)
+        # 多個執行緒同時要求同一個區間時，累積張量與視圖只建立一次
+        self._build_lock = threading.RLock()
+        # 模型或統計每次改變時遞增，外部的結果快取（如 DraftSearch 的置換表）據此判斷是否失效
+        self.version = 0
+
+    def _clear_caches(self):
+        self.winrate_cache.clear()
+        self._cubes.clear()
+        self._views.clear()
+        self.version += 1
+
+    def _load_model(self, modelName):
+        self.model_path = modelName
+        self._booster_bytes = None
+        self.trees = None
+        if modelName is not None and str(modelName).endswith('.npz'):
+            # tree_ensemble.py 匯出的樹模型，不需要 xgboost
+            self.model = None
+            self.trees = TreeEnsemble.load(modelName)
+        elif modelName!= None: 
+            self.model = xgb.Booster()
+            self.model.load_model(modelName)
+            self._export_trees()
+        self._clear_caches()
+
+    def _export_trees(self):
+        self.trees = None
+        if self.FAST_MAX_ROWS > 0:
+            try:
+                self.trees = TreeEnsemble.from_booster(self.model)
+            except ValueError as e:
+                print("無法匯出樹模型，改用 Booster 推論:", e)
+
+    def _set_heroes(self, all_heroes):
+        self.all_heroes = list(all_heroes)
         self.hero_to_idx = {h: i for i, h in enumerate(self.all_heroes)}
         self.idx_to_hero = {i: h for h, i in self.hero_to_idx.items()}
         self.num_heroes = len(self.hero_to_idx)
-        print(self.all_heroes)
-        print("英雄數量:", self.num_heroes)
-        
-        """
-        hero_df = hero_df[hero_df['is_pick']==1][['role','champion']]
-        self.hero_to_pos = {h: p for p, h in enumerate(self.all_heroes)}
-        self.pos_to_hero = {p: h for h, p in self.hero_to_idx.items()}
-        """
-        
-        
-        
-        counts_vs = np.zeros((self.num_heroes, self.num_heroes), dtype=np.int32)
-        
-        wins_vs   = np.zeros((self.num_heroes, self.num_heroes), dtype=np.int32)
-        counts_sy = np.zeros((self.num_heroes, self.num_heroes), dtype=np.int32)
-        wins_sy   = np.zeros((self.num_heroes, self.num_heroes), dtype=np.int32)
-
-        for _, r in games_df.iterrows():
-            t1 = [self.hero_to_idx[h] for h in r['team1_picks'] if h in self.hero_to_idx]
-            t2 = [self.hero_to_idx[h] for h in r['team2_picks'] if h in self.hero_to_idx]
-            t1_win = int(r['label_team1_win'])
-            # counters: each pair (a in t1, b in t2)
-            for a in t1:
-                for b in t2:
-                    counts_vs[a, b] += 1
-                    wins_vs[a, b] += t1_win
-                    counts_vs[b, a] += 1
-                    wins_vs[b, a] += (1 - t1_win)  # from other perspective
-            # synergy: pairs within same team
-            for i in range(len(t1)):
-                for j in range(i+1, len(t1)):
-                    a, b = t1[i], t1[j]
-                    counts_sy[a,b] += 1
-                    wins_sy[a,b] += t1_win
-                    counts_sy[b,a] += 1
-                    wins_sy[b,a] += t1_win
-            for i in range(len(t2)):
-                for j in range(i+1, len(t2)):
-                    a, b = t2[i], t2[j]
-                    counts_sy[a,b] += 1
-                    wins_sy[a,b] += (1 - t1_win)
-                    counts_sy[b,a] += 1
-                    wins_sy[b,a] += (1 - t1_win)
+        # 特徵的 one-hot 區塊只涵蓋模型訓練時的英雄；ingest 新增的英雄只參與 counter/synergy
+        self.feature_heroes = self.num_heroes
+        self.num_features = 6*self.feature_heroes + 4
+
+    def _grow_heroes(self, new_heroes):
+        """在索引尾端加入新英雄（既有索引不變），並把統計矩陣補零擴充"""
+        for h in new_heroes:
+            self.hero_to_idx[h] = len(self.all_heroes)
+            self.idx_to_hero[len(self.all_heroes)] = h
+            self.all_heroes.append(h)
+        grow = len(self.all_heroes) - self.num_heroes
+        self.num_heroes = len(self.all_heroes)
+        pad = ((0, grow), (0, grow))
+        self.counts_vs = np.pad(self.counts_vs, pad)
+        self.wins_vs = np.pad(self.wins_vs, pad)
+        self.counts_sy = np.pad(self.counts_sy, pad)
+        self.wins_sy = np.pad(self.wins_sy, pad)
+        self.counter_prob = np.pad(self.counter_prob, pad, constant_values=0.5)
+        self.synergy_prob = np.pad(self.synergy_prob, pad, constant_values=0.5)
 
+    def _set_counts(self, counts_vs, wins_vs, counts_sy, wins_sy, alpha=1.0):
+        # 保留原始場數，快照與後續更新都需要
+        self.counts_vs, self.wins_vs = counts_vs, wins_vs
+        self.counts_sy, self.wins_sy = counts_sy, wins_sy
         # Laplace smoothing to get probabilities
-        self.alpha = 1.0
+        self.alpha = alpha
         self.counter_prob = (wins_vs + self.alpha) / (counts_vs + 2*self.alpha)  # shape (n,n)
         self.synergy_prob = (wins_sy + self.alpha) / (counts_sy + 2*self.alpha)
-        
+        self._clear_caches()
+
+    def ingest(self, new_games_df):
+        """把新比賽累加進 counter/synergy 統計（原地更新，不需重建整個預測器）
+
+        已計入的 game_id 會略過，因此重複匯入同一批資料是安全的；出現新英雄時擴充英雄索引。
+        統計是原地修改的，不可與查詢同時進行（查詢方法本身可以多執行緒同時呼叫）。
+        只重新計算受影響英雄所在的列與行的平滑機率。
+
+        Returns:
+            實際加入的比賽數
+        """
+        if self.stats_range is not None:
+            raise ValueError("patch 區間視圖不可 ingest，請對原預測器 ingest")
+        games_df = self._prepare_games(new_games_df.copy())
+        if 'game_id' in games_df.columns:
+            ids = self._game_id_keys(games_df['game_id'])
+            games_df = games_df[~(ids.isin(self.game_ids) | (ids.duplicated() & ids.notna()))]
+            games_df = games_df.reset_index(drop=True)
+        if len(games_df) == 0:
+            return 0
+
+        new_heroes = [h for h in self._heroes_in(games_df) if h not in self.hero_to_idx]
+        if new_heroes:
+            self._grow_heroes(new_heroes)
+
+        table = self._encode_games(games_df)
+        counts_vs, wins_vs, counts_sy, wins_sy = self._table_counts(table)
+        self.games_table = self._concat_games(self.games_table, table)
+        self.counts_vs += counts_vs
+        self.wins_vs += wins_vs
+        self.counts_sy += counts_sy
+        self.wins_sy += wins_sy
+
+        # 只有出現在新比賽 pick 裡的英雄，其列與行的場數會改變
+        touched = np.flatnonzero(counts_vs.any(axis=1) | counts_sy.any(axis=1))
+        a = self.alpha
+        for prob, wins, counts in ((self.counter_prob, self.wins_vs, self.counts_vs),
+                                   (self.synergy_prob, self.wins_sy, self.counts_sy)):
+            prob[touched, :] = (wins[touched, :] + a) / (counts[touched, :] + 2*a)
+            prob[:, touched] = (wins[:, touched] + a) / (counts[:, touched] + 2*a)
+
+        if 'game_id' in games_df.columns:
+            self.game_ids.update(self._game_id_keys(games_df['game_id']).dropna())
+        self._clear_caches()
+        return len(games_df)
+
+    @staticmethod
+    def _game_id_keys(ids):
+        """game_id 統一成字串（整數值的浮點數去掉 .0），記憶體中、快照與新資料的 id 才能互相比對"""
+        def key(x):
+            if isinstance(x, (float, np.floating)) and float(x).is_integer():
+                return str(int(x))
+            return str(x)
+        return ids.map(key, na_action='ignore')
+
+    def patches(self):
+        """統計資料中出現過的 patch（已排序）"""
+        p = self.games_table['patch']
+        return np.unique(p[~np.isnan(p)])
+
+    def _patch_cube(self, leagues=None):
+        """取得（必要時建立）指定 league 組合的 patch × hero × hero 累積張量"""
+        cube = self._cubes.get(leagues)
+        if cube is not None:
+            return cube
+        with self._build_lock:
+            cube = self._cubes.get(leagues)
+            if cube is not None:
+                return cube
+            table = self.games_table
+            ok = ~np.isnan(table['patch'])
+            if leagues is not None:
+                ok &= np.isin(table['league'], leagues)
+            rows = np.flatnonzero(ok)
+            patches, group = np.unique(table['patch'][rows], return_inverse=True)
+            counts = self._table_counts(table, rows=rows, group=group, num_groups=len(patches))
+            cube = PatchStatsCube(patches, counts)
+            self._cubes.put(leagues, cube)
+        return cube
+
+    @staticmethod
+    def _league_key(leagues):
+        if leagues is None:
+            return None
+        if isinstance(leagues, str):
+            leagues = [leagues]
+        return tuple(sorted(set(map(str, leagues))))
+
+    def _resolve_patches(self, patches):
+        # "current" / "latest" 代表資料中最新的 patch
+        if isinstance(patches, str) and patches.strip().lower() in ('current', 'latest'):
+            known = self.patches()
+            if len(known) == 0:
+                raise ValueError("資料中沒有 patch 資訊")
+            return known[-1], known[-1]
+        return parse_patch_range(patches)
+
+    def range_stats(self, patches=None, leagues=None):
+        """回傳指定 patch 區間與 league 的 counts_vs, wins_vs, counts_sy, wins_sy
+
+        Args:
+            patches: None（不限）、單一 patch、(lo, hi)、"15.01-15.04" 或 "current"
+            leagues: None（全部）、單一 league 或 league 列表
+        """
+        lo, hi = self._resolve_patches(patches)
+        leagues = self._league_key(leagues)
+        if lo is None and hi is None:
+            # 不限 patch 時直接累加，沒有 patch 資訊的比賽也會計入
+            rows = None if leagues is None else np.flatnonzero(np.isin(self.games_table['league'], leagues))
+            return self._table_counts(self.games_table, rows=rows)
+        return self._patch_cube(leagues).range_counts(lo, hi)
+
+    def stats_view(self, patches=None, leagues=None):
+        """回傳只使用指定 patch 區間 / league 統計的預測器視圖
+
+        視圖與原預測器共用模型與英雄索引，只替換 counter/synergy 機率並有獨立的勝率快取；
+        不指定任何條件時回傳自己。
+        """
+        lo, hi = self._resolve_patches(patches)
+        leagues = self._league_key(leagues)
+        if lo is None and hi is None and leagues is None:
+            return self
+        key = (lo, hi, leagues)
+        view = self._views.get(key)
+        if view is not None:
+            return view
+        with self._build_lock:
+            view = self._views.get(key)
+            if view is None:
+                view = self._with_counts(self.range_stats((lo, hi), leagues), key)
+                self._views.put(key, view)
+        return view
+
+    def _with_counts(self, counts, stats_range):
+        # 共用模型與英雄索引、只替換統計的淺複製；stats_range 標記其來源，視圖不可 ingest
+        view = copy.copy(self)
+        view._init_cache(self.winrate_cache.maxsize, self.cache_mirror)
+        view._set_counts(*counts, alpha=self.alpha)
+        view.stats_range = stats_range
+        return view
+
+    @staticmethod
+    def draft_key(data):
+        """陣容的標準化鍵：pick 順序影響特徵權重，ban 則與順序無關"""
+        return (tuple(data['team1_picks']), tuple(data['team2_picks']),
+                frozenset(data['team1_bans']), frozenset(data['team2_bans']))
+
+    @staticmethod
+    def mirror_key(key):
+        t1_picks, t2_picks, t1_bans, t2_bans = key
+        return (t2_picks, t1_picks, t2_bans, t1_bans)
+
+    def save_snapshot(self, path, source_hash=""):
+        """將英雄索引與統計矩陣存成 .npz 快照（先寫暫存檔再替換，避免讀到一半的檔案）"""
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            np.savez(f,
+                     version=np.array(SNAPSHOT_VERSION),
+                     source_hash=np.array(source_hash),
+                     model_path=np.array(self.model_path or ""),
+                     all_heroes=np.array(self.all_heroes, dtype=str),
+                     feature_heroes=np.array(self.feature_heroes),
+                     game_ids=np.array(sorted(self.game_ids), dtype=str),
+                     alpha=np.array(self.alpha),
+                     games_team1=self.games_table['team1'], games_team2=self.games_table['team2'],
+                     games_win=self.games_table['win'], games_patch=self.games_table['patch'],
+                     games_league=self.games_table['league'],
+                     counts_vs=self.counts_vs, wins_vs=self.wins_vs,
+                     counts_sy=self.counts_sy, wins_sy=self.wins_sy,
+                     counter_prob=self.counter_prob, synergy_prob=self.synergy_prob)
+        os.replace(tmp, path)
+
+    @classmethod
+    def from_snapshot(cls, path, source_hash=None, modelName=None, cache_size=None, cache_mirror=False):
+        """從快照還原預測器，不需重讀 CSV
+
+        Args:
+            path: save_snapshot 寫出的 .npz 檔
+            source_hash: 若提供，與快照記錄的來源雜湊不同時視為過期
+            modelName: 模型路徑；預設使用快照內記錄的路徑
+
+        Raises:
+            ValueError: 快照版本不符或來源資料已變更
+        """
+        with np.load(path, allow_pickle=False) as snap:
+            if int(snap['version']) != SNAPSHOT_VERSION:
+                raise ValueError(f"快照版本不符: {int(snap['version'])} != {SNAPSHOT_VERSION}")
+            if source_hash is not None and str(snap['source_hash']) != source_hash:
+                raise ValueError("來源資料已變更，快照已過期")
+            self = cls.__new__(cls)
+            self._init_cache(cache_size, cache_mirror)
+            self._set_heroes(snap['all_heroes'].tolist())
+            self.feature_heroes = int(snap['feature_heroes'])
+            self.num_features = 6*self.feature_heroes + 4
+            self.game_ids = set(snap['game_ids'].tolist())
+            self.games_table = {k: snap['games_' + k] for k in self.GAMES_TABLE_KEYS}
+            self.counts_vs, self.wins_vs = snap['counts_vs'], snap['wins_vs']
+            self.counts_sy, self.wins_sy = snap['counts_sy'], snap['wins_sy']
+            self.alpha = float(snap['alpha'])
+            self.counter_prob = snap['counter_prob']
+            self.synergy_prob = snap['synergy_prob']
+            stored_model = str(snap['model_path']) or None
+        self._load_model(modelName or stored_model)
+        return self
+
+    @classmethod
+    def from_csv(cls, games_path, hero_path, modelName=None, snapshot_path=None, **kwargs):
+        """讀取 CSV 建立預測器；有 snapshot_path 時優先使用未過期的快照，否則重建並寫入快照
+
+        其餘參數（cache_size, cache_mirror）會傳給建構子。
+        """
+        if snapshot_path is None:
+            return cls(pd.read_csv(games_path), pd.read_csv(hero_path), modelName=modelName, **kwargs)
+        source_hash = hash_files([games_path, hero_path])
+        try:
+            return cls.from_snapshot(snapshot_path, source_hash=source_hash, modelName=modelName, **kwargs)
+        except (OSError, ValueError, KeyError):
+            pass
+        model = cls(pd.read_csv(games_path), pd.read_csv(hero_path), modelName=modelName, **kwargs)
+        try:
+            model.save_snapshot(snapshot_path, source_hash)
+        except OSError as e:
+            print("無法寫入快照:", e)
+        return model
+
+    def _pair_counts(self, t1, m1, t2, m2, t1_win, group=None, num_groups=None):
+        """由 (G, L) 的 pick 索引矩陣累加 counter 與 synergy 的場數/勝場矩陣
+
+        counter: 每組 (a 屬於 team1, b 屬於 team2)，兩個方向各記一次；
+        synergy: 同隊 i<j 的配對，對稱記錄。回傳 counts_vs, wins_vs, counts_sy, wins_sy (int32)。
+        若給定 group（每場 0..num_groups-1 的分組），則各矩陣形狀為 (num_groups, N, N)。
+        """
+        N = self.num_heroes
+        if group is not None:
+            t1_win = t1_win.astype(np.int64)
+            base = group.astype(np.int64) * (N*N)
+        vs_keys, vs_wins, sy_keys, sy_wins = [], [], [], []
+        for i in range(t1.shape[1]):
+            for j in range(t2.shape[1]):
+                ok = m1[:, i] & m2[:, j]
+                a, b, w = t1[ok, i], t2[ok, j], t1_win[ok]
+                if group is not None:
+                    off = base[ok]
+                    vs_keys += [off + a*N + b, off + b*N + a]
+                    vs_wins += [w, 1 - w]
+                    continue
+                vs_keys += [a*N + b, b*N + a]
+                vs_wins += [w, 1 - w]  # from other perspective
+        for t, m, w_team in ((t1, m1, t1_win), (t2, m2, 1 - t1_win)):
+            for i in range(t.shape[1]):
+                for j in range(i+1, t.shape[1]):
+                    ok = m[:, i] & m[:, j]
+                    a, b, w = t[ok, i], t[ok, j], w_team[ok]
+                    if group is not None:
+                        off = base[ok]
+                        sy_keys += [off + a*N + b, off + b*N + a]
+                        sy_wins += [w, w]
+                        continue
+                    sy_keys += [a*N + b, b*N + a]
+                    sy_wins += [w, w]
+
+        shape = (N, N) if group is None else (num_groups, N, N)
+        size = int(np.prod(shape))
+
+        def scatter(keys, wins):
+            if not keys:
+                zero = np.zeros(shape, dtype=np.int32)
+                return zero, zero.copy()
+            keys = np.concatenate(keys)
+            wins = np.concatenate(wins)
+            counts = np.bincount(keys, minlength=size).reshape(shape).astype(np.int32)
+            won = np.bincount(keys[wins == 1], minlength=size).reshape(shape).astype(np.int32)
+            return counts, won
+
+        counts_vs, wins_vs = scatter(vs_keys, vs_wins)
+        counts_sy, wins_sy = scatter(sy_keys, sy_wins)
+        return counts_vs, wins_vs, counts_sy, wins_sy
+
     def parse_list_field(self,x):
         # 支援多種格式：list, "a,b,c" , "['a','b']"
         if isinstance(x, list):
@@ -112,71 +602,175 @@ class BPpredictor:
         if s == '':
             return []
         return [s]
-    def encode(self, data):
-        
-        def weighted_pick_vector(picks):
-            v = np.zeros(self.num_heroes, dtype=np.float32)
+    def _pick_weight(self, i):
+        return self.PICK_WEIGHTS[i] if i < len(self.PICK_WEIGHTS) else self.PICK_WEIGHTS[-1]
+
+    def _index_batch(self, lists, weighted=False):
+        # 轉成補齊長度的索引矩陣 (n, L) 與遮罩；未知英雄略過，權重依照原始清單中的順位
+        pos = [[(i, self.hero_to_idx[h]) for i, h in enumerate(lst) if h in self.hero_to_idx] for lst in lists]
+        L = max([len(p) for p in pos] + [0])
+        idx = np.zeros((len(lists), L), dtype=np.intp)
+        mask = np.zeros((len(lists), L), dtype=bool)
+        w = np.zeros((len(lists), L), dtype=np.float64) if weighted else None
+        for r, p in enumerate(pos):
+            idx[r, :len(p)] = [h for _, h in p]
+            mask[r, :len(p)] = True
+            if weighted:
+                w[r, :len(p)] = [self._pick_weight(i) for i, _ in p]
+        return idx, mask, w
+
+    def _fill_aggregates(self, out, p1, m1, p2, m2):
+        # counter / synergy 平均值；依原本雙層迴圈的順序逐項累加，結果與逐筆計算完全一致
+        N = self.feature_heroes
+        n = len(out)
+        n1 = m1.sum(axis=1)
+        n2 = m2.sum(axis=1)
+        vs12 = np.zeros(n)
+        vs21 = np.zeros(n)
+        for i in range(p1.shape[1]):
+            for j in range(p2.shape[1]):
+                valid = m1[:, i] & m2[:, j]
+                vs12 += np.where(valid, self.counter_prob[p1[:, i], p2[:, j]], 0.0)
+        for i in range(p2.shape[1]):
+            for j in range(p1.shape[1]):
+                valid = m2[:, i] & m1[:, j]
+                vs21 += np.where(valid, self.counter_prob[p2[:, i], p1[:, j]], 0.0)
+        cnt = n1 * n2
+        has = cnt > 0
+        out[:, 6*N] = np.where(has, vs12 / np.maximum(cnt, 1), 0.0)
+        out[:, 6*N + 1] = np.where(has, vs21 / np.maximum(cnt, 1), 0.0)
+
+        for col, p, m, k in ((6*N + 2, p1, m1, n1), (6*N + 3, p2, m2, n2)):
+            sy = np.zeros(n)
+            for i in range(p.shape[1]):
+                for j in range(i+1, p.shape[1]):
+                    valid = m[:, i] & m[:, j]
+                    sy += np.where(valid, self.synergy_prob[p[:, i], p[:, j]], 0.0)
+            pairs = k * (k - 1) // 2
+            out[:, col] = np.where(pairs > 0, sy / np.maximum(pairs, 1), 0.0)
+
+    def _encode_row(self, v, data):
+        # 單筆寫入已歸零的 v；小批量時比向量化版本的固定開銷小
+        N = self.feature_heroes
+        cp, sp = self.counter_prob, self.synergy_prob
+        t1 = [self.hero_to_idx[h] for h in data['team1_picks'] if h in self.hero_to_idx]
+        t2 = [self.hero_to_idx[h] for h in data['team2_picks'] if h in self.hero_to_idx]
+        for a in t1:
+            if a < N: v[a] = 1.0
+        for h in data['team1_bans']:
+            if self.hero_to_idx.get(h, N) < N: v[N + self.hero_to_idx[h]] = 1.0
+        for a in t2:
+            if a < N: v[3*N + a] = 1.0
+        for h in data['team2_bans']:
+            if self.hero_to_idx.get(h, N) < N: v[4*N + self.hero_to_idx[h]] = 1.0
+        for off, picks in ((2*N, data['team1_picks']), (5*N, data['team2_picks'])):
             for i, h in enumerate(picks):
-                if h in self.hero_to_idx:
-                    w = self.PICK_WEIGHTS[i] if i < len(self.PICK_WEIGHTS) else self.PICK_WEIGHTS[-1]
-                    v[self.hero_to_idx[h]] += w
-            return v
-
-        def compute_counter_feature(team_picks_idx, opp_picks_idx):
-            # average pairwise counter probability: mean of counter_prob[a,b] for all a in team, b in opp
-            if len(team_picks_idx) == 0 or len(opp_picks_idx) == 0:
-                return 0.0
+                if self.hero_to_idx.get(h, N) < N:
+                    v[off + self.hero_to_idx[h]] += self._pick_weight(i)
+        if t1 and t2:
+            cnt = len(t1) * len(t2)
             s = 0.0
-            cnt = 0
-            for a in team_picks_idx:
-                for b in opp_picks_idx:
-                    s += self.counter_prob[a,b]
-                    cnt += 1
-            return s / cnt
-
-        def compute_synergy_feature(team_picks_idx):
-            if len(team_picks_idx) < 2:
-                return 0.0
+            for a in t1:
+                for b in t2:
+                    s += cp[a, b]
+            v[6*N] = s / cnt
             s = 0.0
-            cnt = 0
-            for i in range(len(team_picks_idx)):
-                for j in range(i+1, len(team_picks_idx)):
-                    a = team_picks_idx[i]; b = team_picks_idx[j]
-                    s += self.synergy_prob[a,b]
-                    cnt += 1
-            return (s / cnt) if cnt>0 else 0.0
-        t1_picks = [self.hero_to_idx[h] for h in data['team1_picks'] if h in self.hero_to_idx]
-        t2_picks = [self.hero_to_idx[h] for h in data['team2_picks'] if h in self.hero_to_idx]
-        t1_bans  = [self.hero_to_idx[h] for h in data['team1_bans']  if h in self.hero_to_idx]
-        t2_bans  = [self.hero_to_idx[h] for h in data['team2_bans']  if h in self.hero_to_idx]
-        # one-hot vectors
-        t1_pick_oh = np.zeros(self.num_heroes, dtype=np.float32)
-        t2_pick_oh = np.zeros(self.num_heroes, dtype=np.float32)
-        t1_ban_oh  = np.zeros(self.num_heroes, dtype=np.float32)
-        t2_ban_oh  = np.zeros(self.num_heroes, dtype=np.float32)
-        for a in t1_picks: t1_pick_oh[a] = 1.0
-        for a in t2_picks: t2_pick_oh[a] = 1.0
-        for a in t1_bans:  t1_ban_oh[a]  = 1.0
-        for a in t2_bans:  t2_ban_oh[a]  = 1.0
-        
-        # weighted pick vectors (preserve order)
-        t1_pick_w = weighted_pick_vector(data['team1_picks'])
-        t2_pick_w = weighted_pick_vector(data['team2_picks'])
-        
-        # counter features
-        t1_vs_t2_counter = compute_counter_feature(t1_picks, t2_picks)
-        t2_vs_t1_counter = compute_counter_feature(t2_picks, t1_picks)
-        # synergy features
-        t1_synergy = compute_synergy_feature(t1_picks)
-        t2_synergy = compute_synergy_feature(t2_picks)
-
-        # assemble feature vector (concat)
-        feat = np.concatenate([
-            t1_pick_oh, t1_ban_oh, t1_pick_w,
-            t2_pick_oh, t2_ban_oh, t2_pick_w,
-            np.array([t1_vs_t2_counter, t2_vs_t1_counter, t1_synergy, t2_synergy], dtype=np.float32)
-        ]).astype(np.float32)
-        return feat
+            for a in t2:
+                for b in t1:
+                    s += cp[a, b]
+            v[6*N + 1] = s / cnt
+        for col, t in ((6*N + 2, t1), (6*N + 3, t2)):
+            if len(t) < 2:
+                continue
+            s = 0.0
+            for i in range(len(t)):
+                for j in range(i+1, len(t)):
+                    s += sp[t[i], t[j]]
+            v[col] = s / (len(t)*(len(t)-1)//2)
+        return v
+
+    def encode(self, data):
+        return self._encode_row(np.zeros(self.num_features, dtype=np.float32), data)
+
+    def encode_batch(self, drafts, out=None):
+        """將多個陣容編碼到 (n, 6N+4) 的 float32 矩陣；可傳入預先配置的 out 重複使用
+
+        欄位順序：team1 pick one-hot、ban one-hot、加權 pick，team2 同上，最後 4 個 counter/synergy 特徵。
+        """
+        N = self.feature_heroes
+        n = len(drafts)
+        if out is None:
+            out = np.zeros((n, self.num_features), dtype=np.float32)
+        else:
+            out = out[:n]
+            out.fill(0.0)
+        if n < self.SMALL_BATCH:
+            for row, data in enumerate(drafts):
+                self._encode_row(out[row], data)
+            return out
+        p1, m1, w1 = self._index_batch([d['team1_picks'] for d in drafts], weighted=True)
+        p2, m2, w2 = self._index_batch([d['team2_picks'] for d in drafts], weighted=True)
+        b1, bm1, _ = self._index_batch([d['team1_bans'] for d in drafts])
+        b2, bm2, _ = self._index_batch([d['team2_bans'] for d in drafts])
+        rows = np.arange(n)[:, None]
+
+        # one-hot 與加權 pick 向量（保留順序）
+        for off, idx, mask in ((0, p1, m1), (N, b1, bm1), (3*N, p2, m2), (4*N, b2, bm2)):
+            mask = mask & (idx < N)
+            r = np.broadcast_to(rows, idx.shape)[mask]
+            out[r, off + idx[mask]] = 1.0
+        for off, idx, mask, w in ((2*N, p1, m1, w1), (5*N, p2, m2, w2)):
+            # 逐個順位累加（同一英雄重複出現時與逐筆計算的捨入一致）
+            mask = mask & (idx < N)
+            for i in range(idx.shape[1]):
+                r = rows[mask[:, i], 0]
+                c = off + idx[mask[:, i], i]
+                out[r, c] = out[r, c] + w[mask[:, i], i]
+
+        self._fill_aggregates(out, p1, m1, p2, m2)
+        return out
+
+    def encode_candidates(self, data, pick_col, hero_ids, out=None):
+        """以 data 為基底，對每個候選英雄加入 pick_col 後的特徵
+
+        基底陣容的 one-hot 與加權向量只編碼一次，每列只補上新英雄；
+        counter/synergy 以候選向量一次算完。pick_col 也可以是 ban 欄位。
+        """
+        N = self.feature_heroes
+        hero_ids = np.asarray(hero_ids, dtype=np.intp)
+        n = len(hero_ids)
+        if out is None:
+            out = np.empty((n, self.num_features), dtype=np.float32)
+        else:
+            out = out[:n]
+        base = self.encode(data)
+        out[:] = base
+
+        # 不在特徵 one-hot 區塊內的英雄（ingest 新增）只影響 counter/synergy
+        rows = np.flatnonzero(hero_ids < N)
+        ids = hero_ids[rows]
+        if pick_col.endswith('_bans'):
+            # ban 只影響 ban one-hot，其餘特徵與基底相同
+            ban_off = N if pick_col == 'team1_bans' else 4*N
+            out[rows, ban_off + ids] = 1.0
+            return out
+        w = self._pick_weight(len(data[pick_col]))
+        pick_off, w_off = (0, 2*N) if pick_col == 'team1_picks' else (3*N, 5*N)
+        out[rows, pick_off + ids] = 1.0
+        out[rows, w_off + ids] = out[rows, w_off + ids] + w
+
+        # 候選英雄接在己方最後一個位置
+        t1 = np.repeat(self._index_batch([data['team1_picks']])[0], n, axis=0)
+        t2 = np.repeat(self._index_batch([data['team2_picks']])[0], n, axis=0)
+        if pick_col == 'team1_picks':
+            t1 = np.hstack([t1, hero_ids[:, None]])
+        else:
+            t2 = np.hstack([t2, hero_ids[:, None]])
+        m1 = np.ones(t1.shape, dtype=bool)
+        m2 = np.ones(t2.shape, dtype=bool)
+        self._fill_aggregates(out, t1, m1, t2, m2)
+        return out
+
     def onehot_from_list(lst):
         v = np.zeros(self.num_heroes, dtype=np.float32)
         for h in lst:
@@ -185,117 +779,315 @@ class BPpredictor:
         return v
 
     
-    def train(self,data):
-        
-        X_list = []
-        y_list = []
-        meta_list = []
-
-        for _, r in games_df.iterrows():
-            
-            feat = self.encode(r)
-            X_list.append(feat)
-            y_list.append(r['label_team1_win'])
-            
-            meta_list.append({"game_id": r.get("game_id")})
-        
-        
-        X = np.stack(X_list)
-        y = np.array(y_list, dtype=np.int32)
-        
-        
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
-        
-        dtrain = xgb.DMatrix(X_train, label=y_train)
-        
-        dtest  = xgb.DMatrix(X_test, label=y_test)
-        
-        params = {
-            "objective": "binary:logistic",
-            "eval_metric": "auc",
-            "eta": 0.05,
-            "max_depth": 6,
-            "subsample": 0.8,
-            "colsample_bytree": 0.8,
-            "seed": 42,
-            "nthread": 4
-        }
-        self.model.train(params, dtrain, num_boost_round=300, evals=[(dtrain, 'train'), (dtest, 'test')], verbose_eval=50)
+    def stats_version(self):
+        """目前特徵定義的雜湊：英雄索引、統計場數、平滑參數與 pick 權重；任一改變時快取的特徵即失效"""
+        h = hashlib.sha1()
+        h.update("\0".join(self.all_heroes).encode("utf-8"))
+        h.update(np.array([self.feature_heroes, self.alpha], dtype=np.float64).tobytes())
+        h.update(self.PICK_WEIGHTS.astype(np.float64).tobytes())
+        for a in (self.counts_vs, self.wins_vs, self.counts_sy, self.wins_sy):
+            h.update(np.ascontiguousarray(a).tobytes())
+        return h.hexdigest()
+
+    @staticmethod
+    def dataset_hash(games_df):
+        """已整理過的比賽資料（陣容與勝負）的雜湊"""
+        frame = games_df[DRAFT_COLUMNS].astype(str)
+        frame['label_team1_win'] = games_df['label_team1_win'].astype(int)
+        return hashlib.sha1(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes()).hexdigest()
+
+    def training_features(self, games_df, cache_dir=None):
+        """整批編碼訓練資料，回傳 (X, y)
+
+        cache_dir 不為 None 時，以資料雜湊與 stats_version 為鍵把特徵矩陣存成 .npz，
+        之後只調整超參數重新訓練時直接讀取，不需重新編碼。games_df 需先經過 _prepare_games。
+        """
+        path = None
+        if cache_dir is not None:
+            key = hashlib.sha1(f"{self.dataset_hash(games_df)}:{self.stats_version()}".encode()).hexdigest()[:16]
+            path = os.path.join(cache_dir, f"features_{key}.npz")
+            if os.path.exists(path):
+                with np.load(path, allow_pickle=False) as cached:
+                    return cached['X'], cached['y']
+
+        drafts = [dict(zip(DRAFT_COLUMNS, row)) for row in zip(*(games_df[c] for c in DRAFT_COLUMNS))]
+        X = self.encode_batch(drafts)
+        y = games_df['label_team1_win'].to_numpy().astype(np.int32)
+
+        if path is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, 'wb') as f:
+                np.savez(f, X=X, y=y)
+            os.replace(tmp, path)
+        return X, y
+
+    TRAIN_PARAMS = {
+        "objective": "binary:logistic",
+        "eval_metric": "auc",
+        "tree_method": "hist",
+        "eta": 0.05,
+        "max_depth": 6,
+        "subsample": 0.8,
+        "colsample_bytree": 0.8,
+        "seed": 42,
+    }
+
+    @classmethod
+    def fit_booster(cls, X_train, y_train, X_eval, y_eval, params=None, num_boost_round=300,
+                    early_stopping_rounds=30, nthread=4, verbose_eval=False):
+        """以 TRAIN_PARAMS（可由 params 覆寫）訓練，驗證集用於提前停止
 
-        y_pred_prob = self.model.predict(dtest)
+        Returns:
+            (booster, best_iteration)；提前停止時 booster 只保留到最佳的那一輪
+        """
+        dtrain = xgb.DMatrix(X_train, label=y_train, nthread=nthread)
+        deval = xgb.DMatrix(X_eval, label=y_eval, nthread=nthread)
+        params = {**cls.TRAIN_PARAMS, "nthread": nthread, **(params or {})}
+        booster = xgb.train(params, dtrain, num_boost_round=num_boost_round,
+                            evals=[(dtrain, 'train'), (deval, 'eval')],
+                            early_stopping_rounds=early_stopping_rounds, verbose_eval=verbose_eval)
+        best = getattr(booster, 'best_iteration', None) if early_stopping_rounds else None
+        if best is not None:
+            booster = booster[:best + 1]
+        return booster, best
+
+    def train(self, data, params=None, num_boost_round=300, early_stopping_rounds=30, nthread=4,
+              test_size=0.2, cache_dir="feature_cache", model_path="bp_predictor.model", verbose_eval=50):
+        """以整批編碼的特徵訓練 XGBoost 模型並存檔
+
+        Args:
+            data: 比賽資料（格式同 games.csv）
+            params: 覆寫 TRAIN_PARAMS 的超參數
+            early_stopping_rounds: 驗證集 AUC 連續幾輪沒有進步就停止；None 表示不提前停止
+            nthread: XGBoost 使用的執行緒數
+            test_size: 保留給評估的比例；驗證集另從其餘資料切出，不與測試集重疊
+            cache_dir: 特徵矩陣快取目錄；None 表示不快取
+            model_path: 模型輸出路徑；None 表示不存檔
+
+        Returns:
+            {"accuracy", "auc", "best_iteration"}
+        """
+        games_df = self._prepare_games(data.copy())
+        X, y = self.training_features(games_df, cache_dir=cache_dir)
+
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size, random_state=42, stratify=y)
+        # 提前停止用的驗證集從訓練資料再切 10%（同 cross_validate），測試集只用來回報指標
+        X_fit, X_eval, y_fit, y_eval = train_test_split(X_train, y_train, test_size=0.1, random_state=42,
+                                                        stratify=y_train)
+        booster, best = self.fit_booster(X_fit, y_fit, X_eval, y_eval, params=params,
+                                         num_boost_round=num_boost_round,
+                                         early_stopping_rounds=early_stopping_rounds,
+                                         nthread=nthread, verbose_eval=verbose_eval)
+        y_pred_prob = booster.predict(xgb.DMatrix(X_test, nthread=nthread))
         y_pred = (y_pred_prob > 0.5).astype(int)
 
         acc = accuracy_score(y_test, y_pred)
         auc = roc_auc_score(y_test, y_pred_prob)
         print(f"改良版 Baseline - Accuracy: {acc:.4f}, AUC: {auc:.4f}")
-        self.model.save_model("bp_predictor.model")
-        
-    def recommend_pick(self, data, team="blue", top_k=5):
-        current_roles = np.zeros(self.num_heroes)
-        for col in data:
-            data[col] = self.parse_list_field(data[col])
-            for hero in data[col]:
-                current_roles[self.hero_to_idx[hero]] = 1
-        
-        
-        candidates = []
-        for hid in range(self.num_heroes):
-            
-            if current_roles[hid] != 0:  # 已經被選/ban
-                continue
-            hero = self.idx_to_hero[hid]
-            if team =='blue':
-                data['team1_picks'].append(hero)
-                winrate = self.predict_winrate(data)
-                candidates.append((hero, winrate))
-                data['team1_picks'].pop(-1)
-            else:
-                
-                data['team2_picks'].append(hero)
-                winrate = self.predict_winrate(data)
-                candidates.append((hero, 1-winrate))
-                data['team2_picks'].pop(-1)
 
-        candidates.sort(key=lambda x: x[1], reverse= True)
-        
-        return candidates[:top_k]
+        self.model = booster
+        self.model_path = model_path
+        self._booster_bytes = None
+        self._export_trees()
+        self.winrate_cache.clear()
+        self._views.clear()
+        self.version += 1
+        if model_path is not None:
+            self.model.save_model(model_path)
+        return {"accuracy": float(acc), "auc": float(auc), "best_iteration": best}
 
-    def recommend_ban(self,data, target_team="red", top_k=5):
+    def cross_validate(self, data, k=5, params=None, num_boost_round=300, early_stopping_rounds=30,
+                       workers=None, seed=42):
+        """不洩漏測試資料的 k-fold 評估
+
+        counter/synergy 統計只建一次；每個 fold 的訓練統計為「全部場數 − 該 fold 的配對貢獻」，
+        測試 fold 的比賽不會出現在自己的特徵裡。各 fold 在行程池中平行訓練，
+        每個 fold 從訓練資料再切 10% 作提前停止用的驗證集。
+
+        Args:
+            data: 比賽資料（格式同 games.csv）
+            workers: 平行的行程數，預設 min(k, CPU 數)；1 表示不開行程池
+
+        Returns:
+            {"folds": [{"fold", "accuracy", "auc", "best_iteration", "seconds"}, ...],
+             "auc_mean", "auc_std", "accuracy_mean"}
+        """
+        games_df = self._prepare_games(data.copy())
+        table = self._encode_games(games_df)
+        full = self._table_counts(table)
+        drafts = [dict(zip(DRAFT_COLUMNS, row)) for row in zip(*(games_df[c] for c in DRAFT_COLUMNS))]
+        y = table['win'].astype(np.int32)
+
+        cpus = os.cpu_count() or 1
+        workers = min(k, cpus) if workers is None else workers
+        nthread = max(1, cpus // max(1, workers))
+
+        jobs = []
+        folds = StratifiedKFold(n_splits=k, shuffle=True, random_state=seed)
+        for i, (train_idx, test_idx) in enumerate(folds.split(np.zeros(len(y)), y)):
+            held_out = self._table_counts(table, rows=test_idx)
+            fold = self._with_counts([a - b for a, b in zip(full, held_out)], ('cv', i))
+            fold.model = None  # 子行程只需要統計與英雄索引
+            jobs.append(dict(fold=i, predictor=fold,
+                             train=[drafts[j] for j in train_idx], y_train=y[train_idx],
+                             test=[drafts[j] for j in test_idx], y_test=y[test_idx],
+                             params=params, num_boost_round=num_boost_round,
+                             early_stopping_rounds=early_stopping_rounds, nthread=nthread, seed=seed))
+
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_cv_fold, jobs))
+        else:
+            results = [_cv_fold(job) for job in jobs]
+
+        aucs = np.array([r['auc'] for r in results])
+        summary = {"folds": results, "auc_mean": float(aucs.mean()), "auc_std": float(aucs.std()),
+                   "accuracy_mean": float(np.mean([r['accuracy'] for r in results]))}
+        print(f"{k}-fold CV - AUC: {summary['auc_mean']:.4f} ± {summary['auc_std']:.4f}, "
+              f"Accuracy: {summary['accuracy_mean']:.4f}")
+        return summary
+
+    def _score_candidates(self, data, pick_col, hero_ids):
+        # 每個候選英雄一列特徵，整批只建立一個 DMatrix、呼叫一次 predict（回傳 team1 勝率）
+        if len(hero_ids) == 0:
+            return np.zeros(0, dtype=np.float32)
+        X = self.encode_candidates(data, pick_col, hero_ids)
+        return self.predict_features(X)
+
+    def predict_features(self, X):
+        """對已編碼的 (n, 6N+4) 特徵矩陣做一次模型推論，回傳 team1 勝率
+
+        小批次直接在 NumPy 陣列上走訪樹，省去 DMatrix 的固定開銷；以 float32 依樹的順序累加，結果與 Booster.predict 逐位元相同。
+        """
+        if self.trees is not None and (self.model is None or len(X) <= self.FAST_MAX_ROWS):
+            return self.trees.predict(X)
+        return self.model.predict(xgb.DMatrix(X))
+
+    def parse_draft(self, data):
+        """回傳解析後的新陣容 dict（四個欄位皆為 list），不修改傳入的 data"""
+        return {c: self.parse_list_field(data.get(c, [])) for c in DRAFT_COLUMNS}
+
+    def _legal_candidates(self, data):
         current_roles = np.zeros(self.num_heroes)
-        for col in data:
-            data[col] = self.parse_list_field(data[col])
-            for hero in data[col]:
-                current_roles[self.hero_to_idx[hero]] = 1
-        
-        
+        for lst in self.parse_draft(data).values():
+            for hero in lst:
+                if hero in self.hero_to_idx:
+                    current_roles[self.hero_to_idx[hero]] = 1
+        # 已經被選/ban 的英雄不列入候選
+        return [hid for hid in range(self.num_heroes) if current_roles[hid] == 0]
+
+    def _recommend_setup(self, data, kind, team):
+        """回傳 (合法候選, 模擬加入的欄位, 是否以 1-勝率 排序)
+
+        pick：候選加入 team 的 picks；ban：模擬 team 拿到該英雄（對手越強越該 ban）
+        """
+        legal = self._legal_candidates(data)
+        pick_col = 'team1_picks' if team == 'blue' else 'team2_picks'
+        flip = (team != 'blue') if kind == 'pick' else (team == 'blue')
+        return legal, pick_col, flip
+
+    def _rank_candidates(self, legal, winrates, flip, top_k):
         candidates = []
-        for hid in range(self.num_heroes):
-            if current_roles[hid] != 0:  # 已經被選/ban
-                continue
-            hero = self.idx_to_hero[hid]
-
-            # 模擬 ban
-            prev = current_roles[hid]
-            if target_team == 'blue' :
-                data['team1_picks'].append(hero)
-                winrate = self.predict_winrate(data)
-                candidates.append((hero, 1-winrate))
-                data['team1_picks'].pop(-1)
-            else:
-                data['team2_picks'].append(hero)
-                winrate = self.predict_winrate(data)
-                candidates.append((hero, winrate))
-                data['team2_picks'].pop(-1)
+        for hid, winrate in zip(legal, winrates):
+            winrate = float(winrate)
+            candidates.append((self.idx_to_hero[hid], 1-winrate if flip else winrate))
         candidates.sort(key=lambda x: x[1], reverse= True)
         return candidates[:top_k]
 
+    def recommend_pick(self, data, team="blue", top_k=5):
+        data = self.parse_draft(data)
+        legal, pick_col, flip = self._recommend_setup(data, 'pick', team)
+        winrates = self._score_candidates(data, pick_col, legal)
+        return self._rank_candidates(legal, winrates, flip, top_k)
+
+    def recommend_ban(self,data, target_team="red", top_k=5):
+        # 模擬 ban：假設對手拿到該英雄
+        data = self.parse_draft(data)
+        legal, pick_col, flip = self._recommend_setup(data, 'ban', target_team)
+        winrates = self._score_candidates(data, pick_col, legal)
+        return self._rank_candidates(legal, winrates, flip, top_k)
+
     def predict_winrate(self,data):
-        for x in data:
-            data[x]=self.parse_list_field(data[x])
+        # 查詢方法都不修改傳入的 data，也不改變模型狀態（快取除外），可由多個執行緒同時呼叫
+        data = self.parse_draft(data)
+        key = self.draft_key(data)
+        cached = self.winrate_cache.get(key)
+        if cached is not None:
+            return cached
         encode_vec = self.encode(data)
-        dmatrix = xgb.DMatrix(encode_vec.reshape(1, -1))
-        pred = self.model.predict(dmatrix)
-        return float(pred[0])  # Team1 勝率
+        pred = self.predict_features(encode_vec.reshape(1, -1))
+        winrate = float(pred[0])  # Team1 勝率
+        self.winrate_cache.put(key, winrate)
+        if self.cache_mirror:
+            self.winrate_cache.put(self.mirror_key(key), 1 - winrate)
+        return winrate
+
+    def predict_winrate_batch(self, drafts, out=None):
+        """一次預測多個陣容的 team1 勝率（整批一次 DMatrix predict），不修改傳入的 dict
+
+        Args:
+            drafts: 陣容列表，每個元素含 team1_picks / team2_picks / team1_bans / team2_bans
+            out: 可選的預先配置特徵矩陣，筆數需不少於 len(drafts)
+
+        Returns:
+            長度為 len(drafts) 的 np.ndarray
+        """
+        parsed = [self.parse_draft(d) for d in drafts]
+        if not parsed:
+            return np.zeros(0, dtype=np.float32)
+        X = self.encode_batch(parsed, out=out)
+        return self.predict_features(X)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('_build_lock', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._build_lock = threading.RLock()
+
+    def memory_usage(self):
+        """估計常駐記憶體（bytes）：統計矩陣、比賽表、patch 累積張量、區間視圖與模型本身"""
+        total = sum(a.nbytes for a in (self.counts_vs, self.wins_vs, self.counts_sy, self.wins_sy,
+                                       self.counter_prob, self.synergy_prob))
+        if self.stats_range is not None:
+            return total  # 視圖與原預測器共用比賽表與模型
+        total += sum(a.nbytes for a in self.games_table.values())
+        total += sum(cube.nbytes for cube in self._cubes.values())
+        total += sum(view.memory_usage() for view in self._views.values())
+        if getattr(self, 'model', None) is not None:
+            if self._booster_bytes is None:
+                self._booster_bytes = len(self.model.save_raw())
+            total += self._booster_bytes
+        if self.trees is not None:
+            total += self.trees.nbytes
+        return total
+
+    def cache_info(self):
+        """predict_winrate 快取的統計（size / maxsize / hits / misses / evictions）"""
+        return self.winrate_cache.stats()
+
+def _cv_fold(job):
+    """單一 fold：以扣除測試場次後的統計編碼、訓練並評估（供行程池呼叫）"""
+    start = time.perf_counter()
+    predictor = job['predictor']
+    X_train = predictor.encode_batch(job['train'])
+    X_test = predictor.encode_batch(job['test'])
+    X_fit, X_eval, y_fit, y_eval = train_test_split(X_train, job['y_train'], test_size=0.1,
+                                                    random_state=job['seed'], stratify=job['y_train'])
+    booster, best = BPpredictor.fit_booster(X_fit, y_fit, X_eval, y_eval, params=job['params'],
+                                            num_boost_round=job['num_boost_round'],
+                                            early_stopping_rounds=job['early_stopping_rounds'],
+                                            nthread=job['nthread'])
+    prob = booster.predict(xgb.DMatrix(X_test, nthread=job['nthread']))
+    return {"fold": job['fold'],
+            "accuracy": float(accuracy_score(job['y_test'], (prob > 0.5).astype(int))),
+            "auc": float(roc_auc_score(job['y_test'], prob)),
+            "best_iteration": best,
+            "seconds": time.perf_counter() - start}
+
 
 if __name__ == '__main__':
     games_df = pd.read_csv("games.csv")
@@ -339,26 +1131,12 @@ if __name__ == '__main__':
     print(hero)
     hero = model.recommend_pick(data,team = 'red',top_k = 10)
     print(hero)
-    a,b,c,d = 0,0,0,0
-    for i in range(20):
-        if i in [0,2,4,13,15]:
-            
-            hero = model.recommend_ban(data,target_team = 'red',top_k = 10)
-            print(hero)
-            data["team1_bans"].append(hero[0][0])
-            a+=1
-        elif i in [1,3,5,12,14]:
-            hero = model.recommend_ban(data,target_team = 'blue',top_k = 10)[0][0]
-            data["team2_bans"].append(hero)
-            b+=1
-        elif i in [6,9,10,17,18]:
-            hero = model.recommend_pick(data,team = 'blue',top_k = 10)[0][0]
-            data["team1_picks"].append(hero)
-            c+=1
-        else:
-            hero = model.recommend_pick(data,team = 'red',top_k = 10)[0][0]
-            data["team2_picks"].append(hero)
-            d+=1
+    # 依職業賽 BP 順序，每一步用前瞻搜尋決定
+    from draft_search import DRAFT_ORDER, DraftSearch
+    engine = DraftSearch(model, beam_width=5)
+    for _ in DRAFT_ORDER:
+        result = engine.search(data, depth=4, time_budget=2.0)
+        col, hero = result["line"][0]
+        data[col].append(hero)
         print(data)
         print("勝率:", model.predict_winrate(data))
-        
\ No newline at end of file
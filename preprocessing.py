@@ -1,107 +1,128 @@
-import csv 
+import csv
 import pandas as pd
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+ROWS_PER_GAME = 12  # 10 位選手 + 2 筆隊伍資料（ban/pick）
+BAN_COLS = [f"ban{i}" for i in range(1,6)]
+PICK_COLS = [f"pick{i}" for i in range(1,6)]
+USE_COLS = ["gameid", "patch", "league", "side", "position", "champion", "result"] + BAN_COLS + PICK_COLS
+
+
 def make_subset(filename:str):
     with open(filename,encoding='utf-8') as f:
-        df = pd.read_csv(f, index_col=0,nrows = 120) 
+        df = pd.read_csv(f, index_col=0,nrows = 120)
         df.to_csv(filename[:-4]+"Short.csv",index = False)
-        
-def split(filename:str):
-    df = pd.read_csv(filename)
-    games = []
-    
-    ban_col = [f"ban{i}" for i in range(1,6)]
-    pick_col = [f"pick{i}" for i in range(1,6)]
-    
-    for i in range(0, len(df), 12):
-        match_chunk = df.iloc[i:i+12]
-        game_id = match_chunk["gameid"].iloc[0]
-        patch = match_chunk["patch"].iloc[0]
-        league = match_chunk["league"].iloc[0]
-        
-        team1 = match_chunk["side"].iloc[0]
-        team2 = match_chunk["side"].iloc[5]
-        posOfchamp = {match_chunk.iloc[i]["champion"]:match_chunk.iloc[i]["position"] for i in range(10)}
-        team1_players = match_chunk[:5]
-        team2_players = match_chunk[5:10]
-        
-
-        # 取第 11, 12 筆
-        team1_bp = match_chunk.iloc[10][ban_col+pick_col+["result"]]
-        team2_bp = match_chunk.iloc[11][ban_col+pick_col+["result"]]
-        
-        match_data = {
-            "match_id": team1_bp.get("gameid", "unknown"),
-            "team1": {
-                "players": [{"position": match_chunk.iloc[i]["position"], "champion": match_chunk.iloc[i]["champion"]} for i in range(0,6)],
-                "picks": [team1_bp[f"pick{i}"] for i in range(1,6)],
-                "bans": [team1_bp[f"ban{i}"] for i in range(1,6)],
-                "result": team1_bp["result"]
-            },
-            "team2": {
-                "players": [{"position": match_chunk.iloc[i]["position"], "champion": match_chunk.iloc[i]["champion"]} for i in range(6,11)],
-                "picks": [team2_bp[f"pick{i}"] for i in range(1,6)],
-                "bans": [team2_bp[f"ban{i}"] for i in range(1,6)],
-                "result": team2_bp["result"]
-            }
-        }
-
-        
-        games.append({
-            "game_id": game_id,
-            "patch": patch,
-            "league": league,
-            "team1": team1,
-            "team2": team2,
-            "winner": team1 if team1_bp["result"]==1 else team2,
-            "team1_picks": match_data["team1"]["picks"],
-            "team2_picks": match_data["team2"]["picks"],
-            "team1_bans": match_data["team1"]["bans"],
-            "team2_bans": match_data["team2"]["bans"]
-        })
-    
-    games_df = pd.DataFrame(games)
-    
-    
-    games_df.to_csv("games.csv", index=False)
-    
-    heroes = []
-
-    for i in range(0, len(df), 12):
-        match_chunk = df.iloc[i:i+12]
-        game_id = match_chunk["gameid"].iloc[0]
-        
-        # Picks (前 10 筆)
-        for j in range(10):
-            row = match_chunk.iloc[j]
-            heroes.append({
-                "game_id": game_id,
-                "team": row["side"],
-                "role": row["position"],
-                "champion": row["champion"],
-                "is_pick": 1,
-                "is_ban": 0,
-                "result": row["result"]  # 1=win, 0=lose
-            })
-        
-        # Bans (第 11、12 筆)
-        for j in [10, 11]:
-            row = match_chunk.iloc[j]
-            bans = row[ban_cols]
-            for b in bans:
-                heroes.append({
-                    "game_id": game_id,
-                    "team": row["side"],
-                    "role": None,
-                    "champion": b,
-                    "is_pick": 0,
-                    "is_ban": 1,
-                    "result": row["result"]
-                })
-
-    heroes_df = pd.DataFrame(heroes)
-    heroes_df.to_csv("heroes.csv", index=False)
+
+
+def _game_blocks(df):
+    """回傳 (G, 12) 的列索引矩陣，每列為一場比賽連續的 12 筆資料；筆數不是 12 的比賽略過"""
+    gid = df["gameid"].to_numpy()
+    starts = np.flatnonzero(np.r_[True, gid[1:] != gid[:-1]])
+    sizes = np.diff(np.r_[starts, len(gid)])
+    skipped = int((sizes != ROWS_PER_GAME).sum())
+    if skipped:
+        print(f"略過 {skipped} 場資料筆數不是 {ROWS_PER_GAME} 的比賽")
+    return starts[sizes == ROWS_PER_GAME][:, None] + np.arange(ROWS_PER_GAME)
+
+
+def split_chunk(df):
+    """把完整比賽的原始資料轉成 (games_df, heroes_df)，以 reshape 取代逐場 iloc"""
+    idx = _game_blocks(df)
+    G = len(idx)
+    col = lambda name: df[name].to_numpy(dtype=object)
+    side = col("side")[idx]
+    result = col("result")[idx]
+    team1_row, team2_row = idx[:, 10], idx[:, 11]
+    picks = df[PICK_COLS].to_numpy(dtype=object)
+    bans = df[BAN_COLS].to_numpy(dtype=object)
+
+    first = idx[:, 0]
+    games_df = pd.DataFrame({
+        "game_id": df["gameid"].to_numpy()[first],
+        "patch": df["patch"].to_numpy()[first],
+        "league": df["league"].to_numpy()[first],
+        "team1": side[:, 0],
+        "team2": side[:, 5],
+        "winner": np.where(result[:, 10] == 1, side[:, 0], side[:, 5]),
+        "team1_picks": picks[team1_row].tolist(),
+        "team2_picks": picks[team2_row].tolist(),
+        "team1_bans": bans[team1_row].tolist(),
+        "team2_bans": bans[team2_row].tolist(),
+    })
+
+    # 每場 20 筆：前 10 筆為選手 pick，後 10 筆為兩隊各 5 個 ban
+    ban_rows = np.repeat(idx[:, 10:12], 5, axis=1)
+    hero_rows = np.hstack([idx[:, :10], ban_rows])
+    is_pick = np.r_[np.ones(10, dtype=np.int64), np.zeros(10, dtype=np.int64)]
+    role = col("position")[idx[:, :10]]
+    heroes_df = pd.DataFrame({
+        "game_id": np.repeat(games_df["game_id"].to_numpy(), 20),
+        "team": col("side")[hero_rows].ravel(),
+        "role": np.hstack([role, np.full((G, 10), None, dtype=object)]).ravel(),
+        "champion": np.hstack([col("champion")[idx[:, :10]], bans[team1_row], bans[team2_row]]).ravel(),
+        "is_pick": np.tile(is_pick, G),
+        "is_ban": np.tile(1 - is_pick, G),
+        "result": col("result")[hero_rows].ravel(),
+    })
+    return games_df, heroes_df
+
+
+def _complete_chunks(filename, chunksize):
+    """逐塊讀取原始資料；最後一場可能被切斷，留到下一塊再處理"""
+    leftover = None
+    for chunk in pd.read_csv(filename, usecols=USE_COLS, chunksize=chunksize):
+        if leftover is not None:
+            chunk = pd.concat([leftover, chunk], ignore_index=True)
+        gid = chunk["gameid"].to_numpy()
+        cut = len(gid) - 1
+        while cut > 0 and gid[cut-1] == gid[-1]:
+            cut -= 1
+        leftover = chunk.iloc[cut:]
+        if cut > 0:
+            yield chunk.iloc[:cut].reset_index(drop=True)
+    if leftover is not None and len(leftover):
+        yield leftover.reset_index(drop=True)
+
+
+def split(filename:str, games_path="games.csv", heroes_path="heroes.csv", chunksize=None, workers=None):
+    """將原始比賽資料轉成 games.csv 與 heroes.csv
+
+    Args:
+        filename: 原始資料（每場 12 筆：10 位選手 + 2 筆隊伍 ban/pick）
+        chunksize: 每次讀取的列數；None 表示一次讀完
+        workers: >1 時以多個行程平行處理各塊；寫出順序與輸入相同
+    """
+    if chunksize is None:
+        chunks = iter([pd.read_csv(filename, usecols=USE_COLS)])
+    else:
+        chunks = _complete_chunks(filename, chunksize)
+
+    with open(games_path, "w", newline="", encoding="utf-8") as games_f, \
+         open(heroes_path, "w", newline="", encoding="utf-8") as heroes_f:
+        first = True
+
+        def write(result):
+            nonlocal first
+            games_df, heroes_df = result
+            games_df.to_csv(games_f, index=False, header=first)
+            heroes_df.to_csv(heroes_f, index=False, header=first)
+            first = False
+
+        if workers and workers > 1:
+            # 最多同時處理 2*workers 塊，避免整個檔案堆在記憶體裡
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                pending = []
+                for chunk in chunks:
+                    pending.append(pool.submit(split_chunk, chunk))
+                    if len(pending) >= 2 * workers:
+                        write(pending.pop(0).result())
+                for fut in pending:
+                    write(fut.result())
+        else:
+            for chunk in chunks:
+                write(split_chunk(chunk))
 
 
 if __name__ == '__main__':
-    ban_cols = ["ban" + str(i) for i in range(1,6)]
-    split("match_data.csv")
\ No newline at end of file
+    split("match_data.csv", chunksize=120000)
@@ -0,0 +1,77 @@
+"""批量計算陣容勝率：串流讀取 CSV / JSONL，分塊編碼與預測後逐塊寫出
+
+用法：
+    python score_drafts.py games.csv scores.csv
+    python score_drafts.py drafts.jsonl scores.csv --chunksize 2000 --no-translate
+"""
+import argparse
+import csv
+import itertools
+import json
+
+import numpy as np
+import pandas as pd
+
+from predict import BPpredictor, DRAFT_COLUMNS
+from src.tools.hero_name_mapper import load_hero_names
+from src.tools.bp_predictor import translate_drafts
+
+
+def iter_chunks(path, chunksize):
+    """逐塊讀取陣容，每塊為 dict 列表；.jsonl 每行一個 JSON 物件，其餘視為 CSV"""
+    if path.endswith('.jsonl'):
+        with open(path, encoding='utf-8') as f:
+            rows = (json.loads(line) for line in f if line.strip())
+            while True:
+                chunk = list(itertools.islice(rows, chunksize))
+                if not chunk:
+                    return
+                yield chunk
+    else:
+        for df in pd.read_csv(path, chunksize=chunksize):
+            yield df.to_dict('records')
+
+
+def score_file(model, in_path, out_path, chunksize=5000, translate=True, id_col='game_id'):
+    """對整個檔案計算 team1 勝率並寫成 CSV（id, team1_winrate），回傳筆數
+
+    記憶體只與 chunksize 有關：特徵矩陣預先配置一次並在每塊之間重複使用。
+    """
+    buf = np.empty((chunksize, model.num_features), dtype=np.float32)
+    n = 0
+    with open(out_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow([id_col, 'team1_winrate'])
+        for chunk in iter_chunks(in_path, chunksize):
+            drafts = [{c: model.parse_list_field(r.get(c, [])) for c in DRAFT_COLUMNS} for r in chunk]
+            if translate:
+                drafts = translate_drafts(drafts)
+            winrates = model.predict_winrate_batch(drafts, out=buf)
+            writer.writerows([r.get(id_col, n + i), float(w)] for i, (r, w) in enumerate(zip(chunk, winrates)))
+            n += len(chunk)
+    return n
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量計算陣容勝率")
+    parser.add_argument("input", help="陣容檔案（.csv 或 .jsonl）")
+    parser.add_argument("output", help="輸出 CSV")
+    parser.add_argument("--chunksize", type=int, default=5000)
+    parser.add_argument("--no-translate", action="store_true", help="英雄名稱已是標準英文名稱時略過翻譯")
+    parser.add_argument("--id-col", default="game_id")
+    parser.add_argument("--games", default="games.csv")
+    parser.add_argument("--heroes", default="heroes.csv")
+    parser.add_argument("--model", default="bp_predictor.model")
+    parser.add_argument("--snapshot", default="bp_predictor.snapshot.npz")
+    args = parser.parse_args()
+
+    model = BPpredictor.from_csv(args.games, args.heroes, modelName=args.model, snapshot_path=args.snapshot)
+    if not args.no_translate:
+        load_hero_names()
+    n = score_file(model, args.input, args.output, chunksize=args.chunksize,
+                   translate=not args.no_translate, id_col=args.id_col)
+    print(f"已寫出 {n} 筆勝率到 {args.output}")
+
+
+if __name__ == '__main__':
+    main()
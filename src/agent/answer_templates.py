@@ -0,0 +1,84 @@
+"""以固定模板產生回答，不需第二次 LLM 呼叫
+
+每種 Action 各有一個模板，列出翻譯後的陣容與結果；英雄以「中文名稱（英文名稱）」顯示，
+中文名稱取自 HeroNames.txt 的反向映射。
+"""
+from typing import Dict, List
+
+from ..tools.hero_name_mapper import display_name
+
+TEAM_NAMES = {"blue": "藍隊", "red": "紅隊"}
+
+
+def hero_label(name: str) -> str:
+    shown = display_name(name)
+    return name if shown == name else f"{shown}（{name}）"
+
+
+def format_heroes(names: List[str]) -> str:
+    return "、".join(hero_label(n) for n in names) if names else "無"
+
+
+def format_lineup(lineup: Dict[str, List[str]]) -> str:
+    return "\n".join([
+        f"藍隊選擇：{format_heroes(lineup.get('team1_picks', []))}",
+        f"紅隊選擇：{format_heroes(lineup.get('team2_picks', []))}",
+        f"藍隊禁用：{format_heroes(lineup.get('team1_bans', []))}",
+        f"紅隊禁用：{format_heroes(lineup.get('team2_bans', []))}",
+    ])
+
+
+def _assessment(winrate: float, team_name: str) -> str:
+    if winrate >= 0.55:
+        return f"{team_name}陣容明顯佔優，可以照目前的節奏打。"
+    if winrate >= 0.5:
+        return f"{team_name}略佔優勢，但差距不大，細節操作仍是關鍵。"
+    if winrate > 0.45:
+        return f"{team_name}略居下風，可考慮以後續的選擇補強弱點。"
+    return f"{team_name}陣容處於劣勢，建議在剩下的選擇中優先針對對手的核心英雄。"
+
+
+def render_predict_winrate(args: Dict, result, lineup: Dict) -> str:
+    team_name = TEAM_NAMES.get(result["team"], result["team"])
+    other = "紅隊" if result["team"] == "blue" else "藍隊"
+    winrate = result["winrate"]
+    return (f"目前陣容：\n{format_lineup(lineup)}\n\n"
+            f"{team_name}的預測勝率為 {winrate:.2%}（{other} {1 - winrate:.2%}）。\n"
+            f"{_assessment(winrate, team_name)}")
+
+
+def render_recommend_pick(args: Dict, result, lineup: Dict) -> str:
+    team_name = TEAM_NAMES.get(args.get("team", "blue"), "藍隊")
+    lines = [f"{i + 1}. {hero_label(hero)}：選擇後預測勝率 {score:.2%}" for i, (hero, score) in enumerate(result)]
+    if not lines:
+        return f"目前陣容：\n{format_lineup(lineup)}\n\n沒有可推薦給{team_name}的英雄。"
+    return (f"目前陣容：\n{format_lineup(lineup)}\n\n"
+            f"推薦{team_name}選擇：\n" + "\n".join(lines) +
+            f"\n\n首選為{hero_label(result[0][0])}。")
+
+
+def render_recommend_ban(args: Dict, result, lineup: Dict) -> str:
+    team_name = TEAM_NAMES.get(args.get("team", "red"), "紅隊")
+    lines = [f"{i + 1}. {hero_label(hero)}：優先度 {priority:.4f}" for i, (hero, priority) in enumerate(result)]
+    if not lines:
+        return f"目前陣容：\n{format_lineup(lineup)}\n\n沒有可推薦禁用的英雄。"
+    return (f"目前陣容：\n{format_lineup(lineup)}\n\n"
+            f"{team_name}的禁用推薦：\n" + "\n".join(lines) +
+            f"\n\n最優先禁用{hero_label(result[0][0])}。")
+
+
+RENDERERS = {
+    "predict_winrate": render_predict_winrate,
+    "recommend_pick": render_recommend_pick,
+    "recommend_ban": render_recommend_ban,
+}
+
+
+def render_answer(action: str, args: Dict, result, lineup: Dict) -> str:
+    """依 Action 套用模板；工具回傳錯誤字串或未知 Action 時直接說明原因"""
+    renderer = RENDERERS.get(action)
+    if renderer is None:
+        return f"無法處理的動作：{action}"
+    if result is None or isinstance(result, str):
+        return f"無法完成查詢：{result or '工具沒有回傳結果'}"
+    return renderer(args, result, lineup)
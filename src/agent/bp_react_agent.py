@@ -3,17 +3,39 @@ import re
 import json
 import os
 import sys
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import List, Dict, Optional
 
 # 添加項目路徑
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
 
 from ..llm_client import LLMClient
-from ..tools.hero_name_mapper import load_hero_names, translate_hero_name, translate_hero_list
-from ..tools.bp_predictor import predict_winrate, recommend_pick, recommend_ban
+from ..tools.hero_name_mapper import load_hero_names, translate_hero_name, translate_hero_list, hero_names_path
+from ..tools.bp_predictor import predict_winrate, recommend_pick, recommend_ban, get_model
+from .tracing import Trace, exporter_from_env
+from .intent_cache import IntentCache, cache_from_env
+from .fast_parser import parse_fast, get_parser, DEFAULT_THRESHOLD
+from .answer_templates import render_answer
 
 llm = LLMClient()
 
+# 各階段耗時的匯出器，由 BP_TRACE_EXPORT 設定（例如 "jsonl:traces.jsonl" 或 "prometheus:bp.prom"）
+_exporter = exporter_from_env()
+
+# 第一次 LLM 呼叫（意圖解析）的磁碟快取，由 BP_INTENT_CACHE 設定路徑，"off" 表示停用
+_intent_cache = cache_from_env()
+
+# 快速解析的信心分數達到此值就跳過第一次 LLM 呼叫；設為大於 1 的值可停用
+FAST_PATH_THRESHOLD = float(os.getenv("BP_FAST_PATH_THRESHOLD", str(DEFAULT_THRESHOLD)))
+
+# 回答方式："template" 以模板產生（只需一次或零次 LLM 呼叫），"llm" 讓 LLM 總結觀察結果
+ANSWER_MODES = ("template", "llm")
+_answer_mode = os.getenv("BP_ANSWER_MODE", "template")
+
+# 背景預熱（映射表、快速解析器、預設模型），與第一次 LLM 呼叫同時進行
+_warmup_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bp-warmup")
+_warmup: Optional[Future] = None
+
 # 載入映射表以提供給 LLM
 _HERO_MAP_STR = None
 
@@ -48,9 +70,9 @@ def get_system_prompt():
 3. 輸出 JSON 格式的 Action
 
 可用的工具：
-- predict_winrate(team1_picks, team2_picks, team1_bans, team2_bans, team): 預測勝率
-- recommend_pick(team1_picks, team2_picks, team1_bans, team2_bans, team, top_k): 推薦選擇
-- recommend_ban(team1_picks, team2_picks, team1_bans, team2_bans, target_team, top_k): 推薦禁用
+- predict_winrate(team1_picks, team2_picks, team1_bans, team2_bans, team, patch_range, leagues): 預測勝率
+- recommend_pick(team1_picks, team2_picks, team1_bans, team2_bans, team, top_k, patch_range, leagues): 推薦選擇
+- recommend_ban(team1_picks, team2_picks, team1_bans, team2_bans, target_team, top_k, patch_range, leagues): 推薦禁用
 
 **英雄名稱映射規則（必須嚴格遵守）：**
 - 必須使用標準英文名稱，例如："Xin Zhao"（不是 "Zhao Xin"）、"Taliyah"（不是 "Yan"）、"Neeko"（不是 "Niko"）
@@ -78,6 +100,7 @@ def get_system_prompt():
 2. team1_picks 和 team2_picks 是字符串數組
 3. 如果沒有指定，bans 為空數組
 4. team 參數：預測勝率時指定要查詢的隊伍，推薦時指定要為哪個隊伍推薦
+5. 用戶指定版本時加上 patch_range（例如 "15.01-15.04"，「當前版本」用 "current"）；指定賽區時加上 leagues（例如 ["LCK"]）；未指定則省略
 
 用繁體中文回應。"""
 
@@ -102,38 +125,170 @@ def parse_json_action(text: str) -> Optional[Dict]:
         return None
 
 
-def run_bp_react(user_input: str) -> str:
-    """運行 BP ReAct 循環"""
-    messages = [
-        {"role": "system", "content": get_system_prompt()},
-        {"role": "user", "content": user_input}
-    ]
+def _warm_up_task():
+    # 模型最慢，先載入；映射表與解析器主執行緒可能已經載入過，重複呼叫不會重建
+    get_model()
+    load_hero_names()
+    get_hero_mapping_info()
+    get_parser()
+
+
+def warm_up() -> Future:
+    """在背景載入映射表、快速解析器與預設模型（session 開始時呼叫），重複呼叫只會執行一次"""
+    global _warmup
+    if _warmup is None:
+        _warmup = _warmup_pool.submit(_warm_up_task)
+    return _warmup
+
+
+def _wait_warm_up():
+    """等待背景預熱完成；預熱失敗時不拋出，交由之後的工具回報錯誤"""
+    try:
+        warm_up().result()
+    except Exception as e:
+        print(f"背景預熱失敗: {e}")
+
+
+def _fenced_action_done(text: str) -> bool:
+    # 已經出現完整的 ```json ... ``` 區塊
+    start = text.find("```json")
+    return start >= 0 and text.find("```", start + 7) >= 0
+
+
+def _plan(messages: List[Dict], trace: Trace) -> str:
+    """串流第一次 LLM 呼叫；JSON Action 區塊一結束就停止讀取，不等模型寫完後面的說明"""
+    parts = []
+    stream = llm.stream(messages)
+    try:
+        for token in stream:
+            parts.append(token)
+            if _fenced_action_done("".join(parts)):
+                trace.attrs["plan_early_stop"] = True
+                break
+    finally:
+        stream.close()
+    return "".join(parts)
+
+
+def set_trace_exporter(exporter):
+    """設定 trace 匯出器（JSONLExporter / PrometheusExporter），None 表示不匯出"""
+    global _exporter
+    _exporter = exporter
+
+
+def set_intent_cache(cache: Optional[IntentCache]):
+    """設定意圖解析快取，None 表示不使用"""
+    global _intent_cache
+    _intent_cache = cache
+
+
+def set_answer_mode(mode: str):
+    """設定預設的回答方式（"template" 或 "llm"），作用於之後的所有請求"""
+    global _answer_mode
+    if mode not in ANSWER_MODES:
+        raise ValueError(f"未知的回答方式: {mode}（可用：{', '.join(ANSWER_MODES)}）")
+    _answer_mode = mode
+
+
+def get_answer_mode() -> str:
+    return _answer_mode
+
+
+def run_bp_react(user_input: str, return_trace: bool = False, answer_mode: Optional[str] = None):
+    """運行 BP ReAct 循環
     
-    # Step 1: 讓 LLM 解析輸入並生成 Action
-    print("\n[Agent 思考]")
-    step1 = llm.generate(messages)
-    print(step1)
+    Args:
+        user_input: 用戶輸入
+        return_trace: 為 True 時回傳 (回答, Trace)，Trace 記錄各階段耗時
+        answer_mode: 這次請求的回答方式（"template" / "llm"），None 時使用 set_answer_mode 的設定
+    """
+    answer_mode = answer_mode or _answer_mode
+    if answer_mode not in ANSWER_MODES:
+        raise ValueError(f"未知的回答方式: {answer_mode}（可用：{', '.join(ANSWER_MODES)}）")
+    trace = Trace(answer_mode=answer_mode)
+    try:
+        final = _run_bp_react(user_input, trace, answer_mode)
+    finally:
+        trace.finish()
+        if _exporter is not None:
+            try:
+                _exporter.export(trace)
+            except Exception as e:
+                print(f"trace 匯出失敗: {e}")
+    return (final, trace) if return_trace else final
+
+
+def _run_bp_react(user_input: str, trace: Trace, answer_mode: str) -> str:
+    # 第一次查詢時模型在背景載入，與 LLM 解析重疊
+    warm_up()
+    
+    with trace.span("prompt_build"):
+        system_prompt = get_system_prompt()
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_input}
+        ]
+    
+    # 簡單句型（「藍隊選了X、Y，紅隊選了Z，預測勝率」）直接以別名自動機解析
+    action_data = None
+    try:
+        with trace.span("fast_parse"):
+            fast_action, confidence = parse_fast(user_input)
+        trace.attrs["fast_path_confidence"] = round(confidence, 3)
+        if fast_action is not None and confidence >= FAST_PATH_THRESHOLD:
+            action_data = fast_action
+    except Exception as e:
+        print(f"快速解析失敗，改用 LLM: {e}")
+    trace.attrs["fast_path"] = action_data is not None
     
-    # 解析 Action
-    action_data = parse_json_action(step1)
+    # 同樣的問題、模型、提示詞與映射表，解析結果必定相同，直接沿用快取
+    cache = _intent_cache
+    if action_data is None and cache is not None:
+        with trace.span("intent_cache"):
+            namespace = IntentCache.namespace(llm.model_name(), system_prompt, hero_names_path())
+            action_data = cache.get(namespace, user_input)
+        trace.attrs["intent_cache_hit"] = action_data is not None
     
-    if not action_data:
-        return "無法解析 Action，請檢查輸出格式。"
+    if action_data is not None:
+        step1 = f"```json\n{json.dumps(action_data, ensure_ascii=False, indent=2)}\n```"
+        print("\n[Agent 思考（快速解析）]" if trace.attrs["fast_path"] else "\n[Agent 思考（快取）]")
+        print(step1)
+    else:
+        # Step 1: 讓 LLM 解析輸入並生成 Action
+        print("\n[Agent 思考]")
+        with trace.span("llm_plan"):
+            step1 = _plan(messages, trace)
+        print(step1)
+        
+        # 解析 Action
+        with trace.span("parse"):
+            action_data = parse_json_action(step1)
+        
+        if not action_data:
+            return "無法解析 Action，請檢查輸出格式。"
+        if cache is not None:
+            cache.put(namespace, user_input, action_data)
     
     action = action_data.get("action")
     args = action_data.get("args", {})
+    trace.attrs["action"] = action
     
     print(f"\n[執行 Action: {action}]")
     print(f"[參數: {json.dumps(args, ensure_ascii=False, indent=2)}]")
     
     # 執行對應的工具
     obs = None
+    result = None
+    lineup = {}
     try:
         # 先翻譯所有英雄名稱
-        team1_picks = translate_hero_list(args.get("team1_picks", []))
-        team2_picks = translate_hero_list(args.get("team2_picks", []))
-        team1_bans = translate_hero_list(args.get("team1_bans", []))
-        team2_bans = translate_hero_list(args.get("team2_bans", []))
+        with trace.span("translate"):
+            team1_picks = translate_hero_list(args.get("team1_picks", []))
+            team2_picks = translate_hero_list(args.get("team2_picks", []))
+            team1_bans = translate_hero_list(args.get("team1_bans", []))
+            team2_bans = translate_hero_list(args.get("team2_bans", []))
+        lineup = {"team1_picks": team1_picks, "team2_picks": team2_picks,
+                  "team1_bans": team1_bans, "team2_bans": team2_bans}
         
         print(f"\n[翻譯後的陣容]")
         print(f"藍隊選擇: {team1_picks}")
@@ -141,63 +296,94 @@ def run_bp_react(user_input: str) -> str:
         print(f"藍隊禁用: {team1_bans}")
         print(f"紅隊禁用: {team2_bans}")
         
-        if action == "predict_winrate":
-            result = predict_winrate(
-                team1_picks=team1_picks,
-                team2_picks=team2_picks,
-                team1_bans=team1_bans,
-                team2_bans=team2_bans,
-                team=args.get("team", "blue")
-            )
-            if isinstance(result, dict) and "winrate" in result:
-                team_name = "藍隊" if result["team"] == "blue" else "紅隊"
-                obs = f"{team_name}的預測勝率: {result['winrate']:.2%}"
-            else:
-                obs = str(result)
+        # 等背景預熱完成並載入對應的模型，冷啟動的時間才不會算在工具執行裡；失敗時由工具回報錯誤
+        try:
+            with trace.span("model_load"):
+                _wait_warm_up()
+                get_model(args.get("patch_range"), args.get("leagues"))
+        except Exception:
+            pass
         
-        elif action == "recommend_pick":
-            result = recommend_pick(
-                team1_picks=team1_picks,
-                team2_picks=team2_picks,
-                team1_bans=team1_bans,
-                team2_bans=team2_bans,
-                team=args.get("team", "blue"),
-                top_k=args.get("top_k", 5)
-            )
-            if isinstance(result, list):
-                obs = "推薦選擇:\n" + "\n".join([f"{i+1}. {hero}: {score:.4f}" for i, (hero, score) in enumerate(result)])
-            else:
-                obs = str(result)
+        with trace.span("tool"):
+            if action == "predict_winrate":
+                result = predict_winrate(
+                    team1_picks=team1_picks,
+                    team2_picks=team2_picks,
+                    team1_bans=team1_bans,
+                    team2_bans=team2_bans,
+                    team=args.get("team", "blue"),
+                    patch_range=args.get("patch_range"),
+                    leagues=args.get("leagues")
+                )
+                if isinstance(result, dict) and "winrate" in result:
+                    team_name = "藍隊" if result["team"] == "blue" else "紅隊"
+                    obs = f"{team_name}的預測勝率: {result['winrate']:.2%}"
+                else:
+                    obs = str(result)
         
-        elif action == "recommend_ban":
-            result = recommend_ban(
-                team1_picks=team1_picks,
-                team2_picks=team2_picks,
-                team1_bans=team1_bans,
-                team2_bans=team2_bans,
-                target_team=args.get("team", "red"),
-                top_k=args.get("top_k", 5)
-            )
-            if isinstance(result, list):
-                obs = "推薦禁用:\n" + "\n".join([f"{i+1}. {hero}: {priority:.4f}" for i, (hero, priority) in enumerate(result)])
-            else:
-                obs = str(result)
+            elif action == "recommend_pick":
+                result = recommend_pick(
+                    team1_picks=team1_picks,
+                    team2_picks=team2_picks,
+                    team1_bans=team1_bans,
+                    team2_bans=team2_bans,
+                    team=args.get("team", "blue"),
+                    top_k=args.get("top_k", 5),
+                    patch_range=args.get("patch_range"),
+                    leagues=args.get("leagues")
+                )
+                if isinstance(result, list):
+                    obs = "推薦選擇:\n" + "\n".join([f"{i+1}. {hero}: {score:.4f}" for i, (hero, score) in enumerate(result)])
+                else:
+                    obs = str(result)
         
-        else:
-            obs = f"未知的動作: {action}"
+            elif action == "recommend_ban":
+                result = recommend_ban(
+                    team1_picks=team1_picks,
+                    team2_picks=team2_picks,
+                    team1_bans=team1_bans,
+                    team2_bans=team2_bans,
+                    target_team=args.get("team", "red"),
+                    top_k=args.get("top_k", 5),
+                    patch_range=args.get("patch_range"),
+                    leagues=args.get("leagues")
+                )
+                if isinstance(result, list):
+                    obs = "推薦禁用:\n" + "\n".join([f"{i+1}. {hero}: {priority:.4f}" for i, (hero, priority) in enumerate(result)])
+                else:
+                    obs = str(result)
+        
+            else:
+                obs = f"未知的動作: {action}"
     
     except Exception as e:
         obs = f"執行錯誤: {e}"
+        result = obs
         import traceback
         traceback.print_exc()
     
+    if answer_mode == "template":
+        with trace.span("render"):
+            final = render_answer(action, args, result, lineup)
+        print("\n[助手回應]")
+        print(final)
+        return final
+    
     # Step 2: 將觀察結果返回給 LLM，讓它生成最終回答
     messages.append({"role": "assistant", "content": step1})
     messages.append({"role": "user", "content": f"Observation: {obs}\n\n請用繁體中文總結結果並給出建議。"})
     
+    # 邊產生邊顯示，使用者不必等整段回答完成
     print(f"\n[助手回應]")
-    final = llm.generate(messages)
-    print(final)
+    with trace.span("llm_summary"):
+        parts = []
+        stream = llm.stream(messages)
+        for token in stream:
+            print(token, end="", flush=True)
+            parts.append(token)
+        final = "".join(parts)
+    print()
+    trace.attrs["summary_ttft"] = stream.ttft
     
     return final
 
@@ -205,5 +391,6 @@ def run_bp_react(user_input: str) -> str:
 if __name__ == '__main__':
     # 測試
     test_input = "藍隊選擇了妮可，紅隊選了趙信跟岩雀，請預測勝率"
-    result = run_bp_react(test_input)
+    result, trace = run_bp_react(test_input, return_trace=True)
     print(f"\n最終結果:\n{result}")
+    print(f"\n[耗時] {trace.summary()}")
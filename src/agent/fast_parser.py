@@ -0,0 +1,248 @@
+"""不經 LLM 的快速意圖解析
+
+把 HeroNames.txt 的所有別名與隊伍 / pick / ban / 意圖關鍵字編成一個 Aho-Corasick 自動機，
+一次線性掃描取出所有命中，再依出現順序歸到藍紅兩隊的 picks / bans。
+信心分數 = 被辨識出的字元比例（標點與空白不計），句型不確定時再打折；
+分數夠高時 Agent 直接使用結果，省下第一次 LLM 呼叫，其餘情況照舊交給 LLM。
+"""
+import re
+import threading
+import unicodedata
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from ..tools.hero_name_mapper import load_hero_names
+
+TEAM_WORDS = {
+    "blue": ["藍隊", "藍方", "藍色方", "藍色", "藍", "蓝队", "蓝方", "蓝", "blue", "team1"],
+    "red": ["紅隊", "紅方", "紅色方", "紅色", "紅", "红队", "红方", "红", "red", "team2"],
+}
+PICK_WORDS = ["選了", "選擇了", "選擇", "選", "拿了", "拿", "用了", "选了", "选", "pick了", "picked", "picks", "pick"]
+BAN_WORDS = ["禁了", "禁用了", "禁用", "禁掉", "禁", "ban了", "ban掉", "banned", "bans", "ban"]
+INTENT_WORDS = {
+    "predict_winrate": ["勝率", "胜率", "預測", "预测", "贏面", "誰會贏", "誰贏", "winrate", "win rate"],
+    "recommend": ["推薦", "推荐", "建議", "建议", "選誰", "該選什麼", "選什麼", "選哪個", "拿誰", "选谁",
+                  "pick誰", "recommend"],
+    "recommend_ban": ["ban誰", "ban什麼", "ban哪個", "禁誰", "禁什麼", "禁哪個", "禁谁"],
+}
+# 否定 / 排除語氣：「沒有選」、「不要推薦」、「除了 Ahri 之外」，關鍵字比對無法正確處理，一律交給 LLM
+NEGATION_WORDS = ["沒有", "没有", "沒選", "没选", "沒拿", "没拿", "不要", "不用", "不選", "不选", "不拿", "不是",
+                  "並非", "并非", "除了", "除外", "以外", "別選", "别选", "別拿", "别拿", "別", "别",
+                  "not", "no", "without", "except", "don't", "dont", "isn't", "didn't"]
+# 版本 / 賽區篩選（patch_range、leagues）：快速解析不處理，一律交給 LLM，避免默默改用全體統計
+FILTER_WORDS = ["版本", "當前版本", "当前版本", "本版本", "賽區", "赛区", "聯賽", "联赛", "賽季", "赛季", "世界賽", "世界赛",
+                "patch", "version", "season", "league", "current",
+                "lck", "lckc", "lpl", "lec", "lcs", "lta", "lcp", "pcs", "vcs", "ljl", "cblol", "lla", "lfl", "nacl",
+                "tcl", "msi", "worlds", "ewc", "fst"]
+# "15.01"、"14.24" 之類的 patch 編號
+PATCH_NUMBER = re.compile(r"\d+\s*\.\s*\d+")
+# 不影響語意的常見字詞，只用來計算覆蓋率
+FILLER_WORDS = ["了", "的", "和", "跟", "與", "与", "及", "以及", "還有", "还有", "請", "请", "幫我", "帮我", "幫忙",
+                "目前", "陣容", "阵容", "是", "現在", "现在", "已經", "已经", "一下", "嗎", "吗", "呢",
+                "多少", "如何", "怎麼樣", "怎么样", "應該", "应该", "該", "该", "會", "会", "要", "我", "我們", "分別",
+                "英雄", "有", "誰", "谁", "什麼", "這", "這局", "這場", "對面", "對上", "對", "vs", "and", "please", "the"]
+
+# 低於此分數就交給 LLM
+DEFAULT_THRESHOLD = 0.85
+
+
+class AhoCorasick:
+    """多字串比對自動機；每個節點記錄以該位置結尾的最長樣式"""
+
+    def __init__(self):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.out: List[Optional[Tuple[int, object]]] = [None]
+
+    def add(self, word: str, payload):
+        """加入樣式；同一個字串只保留第一次加入的 payload"""
+        node = 0
+        for ch in word:
+            nxt = self.goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[node][ch] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append(None)
+            node = nxt
+        if self.out[node] is None:
+            self.out[node] = (len(word), payload)
+
+    def build(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self.goto[node].items():
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[child] = self.goto[f].get(ch, 0)
+                # 自己不是樣式時，沿 fail 鏈繼承最長的後綴樣式
+                if self.out[child] is None:
+                    self.out[child] = self.out[self.fail[child]]
+                queue.append(child)
+        return self
+
+    def find(self, text: str) -> List[Tuple[int, int, object]]:
+        """回傳不重疊的 (start, end, payload)，優先取最左、最長的命中"""
+        hits = []
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(ch, 0)
+            if self.out[node] is not None:
+                length, payload = self.out[node]
+                hits.append((i + 1 - length, i + 1, payload))
+        hits.sort(key=lambda h: (h[0], h[0] - h[1]))
+        chosen, last_end = [], 0
+        for start, end, payload in hits:
+            if start >= last_end:
+                chosen.append((start, end, payload))
+                last_end = end
+        return chosen
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isascii() and ch.isalnum()
+
+
+def _ignorable(ch: str) -> bool:
+    return ch.isspace() or unicodedata.category(ch)[0] in "PSZ"
+
+
+class FastIntentParser:
+    def __init__(self, hero_map: Dict[str, str]):
+        ac = AhoCorasick()
+        # 關鍵字先加入，與英雄別名完全相同時以關鍵字為準
+        for team, words in TEAM_WORDS.items():
+            for w in words:
+                ac.add(w, ("team", team))
+        for w in PICK_WORDS:
+            ac.add(w, ("pick", None))
+        for w in BAN_WORDS:
+            ac.add(w, ("ban", None))
+        for intent, words in INTENT_WORDS.items():
+            for w in words:
+                ac.add(w, ("intent", intent))
+        for w in NEGATION_WORDS:
+            ac.add(w, ("negation", None))
+        for w in FILTER_WORDS:
+            ac.add(w, ("filter", None))
+        for w in FILLER_WORDS:
+            ac.add(w, ("filler", None))
+        for alias, english in hero_map.items():
+            ac.add(alias.lower(), ("hero", english))
+            # "kaisa"、"xinzhao" 之類省略標點 / 空白的英文寫法
+            compact = "".join(ch for ch in alias.lower() if ch.isalnum())
+            if compact.isascii() and compact != alias.lower():
+                ac.add(compact, ("hero", english))
+        self.automaton = ac.build()
+
+    def scan(self, text: str) -> List[Tuple[int, int, str, Optional[str]]]:
+        """回傳 (start, end, 種類, 值)；英文樣式必須是完整單字，避免 "vi" 命中 "review" """
+        tokens = []
+        for start, end, (kind, value) in self.automaton.find(text):
+            if _is_word_char(text[start]) and start > 0 and _is_word_char(text[start - 1]):
+                continue
+            if _is_word_char(text[end - 1]) and end < len(text) and _is_word_char(text[end]):
+                continue
+            tokens.append((start, end, kind, value))
+        return tokens
+
+    def parse(self, user_input: str) -> Tuple[Optional[Dict], float]:
+        """回傳 (JSON Action, 信心分數 0~1)；無法判斷時為 (None, 0.0)"""
+        text = unicodedata.normalize("NFKC", user_input).lower()
+        tokens = self.scan(text)
+        if any(kind in ("negation", "filter") for _, _, kind, _ in tokens) or PATCH_NUMBER.search(text):
+            return None, 0.0
+
+        lists = {("blue", "pick"): [], ("red", "pick"): [], ("blue", "ban"): [], ("red", "ban"): []}
+        team, mode = None, "pick"
+        intent, intent_pos = None, None
+        bare_teams = []        # 沒有接任何英雄的隊伍關鍵字（多半是「藍隊勝率」、「紅隊該選誰」）
+        pending_team = None
+        penalty = 1.0
+        seen = set()
+        for start, _, kind, value in tokens:
+            if kind == "team":
+                if pending_team is not None:
+                    bare_teams.append(pending_team)
+                team, mode, pending_team = value, "pick", (value, start)
+            elif kind in ("pick", "ban"):
+                mode = kind
+            elif kind == "intent":
+                # 「推薦禁用」之類兩個意圖詞同時出現時，以較明確的為準
+                if intent is None or value == "recommend_ban" or (intent == "recommend" and value != "predict_winrate"):
+                    intent, intent_pos = value, start
+                elif intent != value:
+                    penalty *= 0.5
+            elif kind == "hero":
+                if team is None:
+                    return None, 0.0
+                if value in seen:
+                    penalty *= 0.5
+                seen.add(value)
+                lists[(team, mode)].append(value)
+                pending_team = None
+        if pending_team is not None:
+            bare_teams.append(pending_team)
+
+        if intent is None:
+            return None, 0.0
+        if intent == "recommend":
+            # 「推薦紅隊應該 ban 誰」：最後一個 ban 關鍵字之後沒有英雄
+            last_ban = max((s for s, _, k, _ in tokens if k == "ban"), default=None)
+            last_hero = max((s for s, _, k, _ in tokens if k == "hero"), default=-1)
+            intent = "recommend_ban" if last_ban is not None and last_ban > last_hero else "recommend_pick"
+
+        # 目標隊伍：離意圖詞最近、且沒有接英雄的隊伍關鍵字
+        target = None
+        if bare_teams:
+            target = min(bare_teams, key=lambda t: abs(t[1] - intent_pos))[0]
+        if target is None:
+            if intent == "predict_winrate":
+                target = "blue"
+            else:
+                # 不知道要幫哪一隊推薦
+                target = "red" if intent == "recommend_ban" else "blue"
+                penalty *= 0.5
+        if intent == "predict_winrate" and not seen:
+            return None, 0.0
+
+        meaningful = [i for i, ch in enumerate(text) if not _ignorable(ch)]
+        covered = set()
+        for start, end, _, _ in tokens:
+            covered.update(range(start, end))
+        coverage = sum(1 for i in meaningful if i in covered) / len(meaningful) if meaningful else 0.0
+
+        action = {
+            "action": intent,
+            "args": {
+                "team1_picks": lists[("blue", "pick")],
+                "team2_picks": lists[("red", "pick")],
+                "team1_bans": lists[("blue", "ban")],
+                "team2_bans": lists[("red", "ban")],
+                "team": target,
+            },
+        }
+        return action, coverage * penalty
+
+
+_parser: Optional[FastIntentParser] = None
+_parser_lock = threading.Lock()
+
+
+def get_parser() -> FastIntentParser:
+    global _parser
+    if _parser is None:
+        with _parser_lock:
+            if _parser is None:
+                _parser = FastIntentParser(load_hero_names())
+    return _parser
+
+
+def parse_fast(user_input: str) -> Tuple[Optional[Dict], float]:
+    """以別名自動機解析用戶輸入，回傳 (JSON Action, 信心分數)"""
+    return get_parser().parse(user_input)
@@ -0,0 +1,140 @@
+"""意圖解析（第一次 LLM 呼叫）的磁碟快取
+
+以 (LLM 模型, 系統提示詞雜湊, HeroNames.txt 雜湊, 正規化後的用戶輸入) 為鍵，
+儲存解析好的 JSON Action。提示詞或映射表一改變，命名空間就不同，舊資料自動失效並在下次寫入時清除。
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Dict, Optional
+
+# 檔案 (路徑, mtime, 大小) -> 內容雜湊，避免每次查詢都重讀檔案
+_FILE_HASHES: Dict[tuple, str] = {}
+
+
+def file_hash(path: Optional[str]) -> str:
+    if not path or not os.path.exists(path):
+        return ""
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+    if key not in _FILE_HASHES:
+        with open(path, "rb") as f:
+            _FILE_HASHES[key] = hashlib.sha256(f.read()).hexdigest()
+    return _FILE_HASHES[key]
+
+
+def normalize_input(text: str) -> str:
+    """全形 / 半形統一、去除多餘空白（中文字前後的空白全部去掉），讓只差排版的問題共用快取"""
+    text = " ".join(unicodedata.normalize("NFKC", text).split())
+    return re.sub(r" ?([^\x00-\x7f]) ?", r"\1", text)
+
+
+class IntentCache:
+    """SQLite 快取，有 TTL 與筆數上限（超過時淘汰最久未使用的項目）
+
+    資料庫在第一次 get / put 時才開啟，只 import 或建立物件不會在磁碟上產生檔案；
+    無法開啟時印出原因並停用快取（get 一律未命中，put 不做事）。
+    """
+
+    def __init__(self, path: str, ttl: float = 7 * 24 * 3600, max_entries: int = 10000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._failed = False
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        # 呼叫端需持有 self._lock
+        if self._conn is None and not self._failed:
+            try:
+                conn = sqlite3.connect(self.path, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS intents ("
+                    " key TEXT PRIMARY KEY, namespace TEXT NOT NULL, created REAL NOT NULL,"
+                    " last_used REAL NOT NULL, action TEXT NOT NULL)")
+                conn.execute("CREATE INDEX IF NOT EXISTS intents_last_used ON intents(last_used)")
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"無法開啟意圖快取 {self.path}: {e}")
+                self._failed = True
+                return None
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def namespace(model: str, system_prompt: str, hero_names_path: Optional[str]) -> str:
+        h = hashlib.sha256()
+        for part in (model or "", system_prompt, file_hash(hero_names_path)):
+            h.update(part.encode("utf-8"))
+            h.update(b"\0")
+        return h.hexdigest()
+
+    @staticmethod
+    def make_key(namespace: str, user_input: str) -> str:
+        return hashlib.sha256(f"{namespace}\0{normalize_input(user_input)}".encode("utf-8")).hexdigest()
+
+    def get(self, namespace: str, user_input: str) -> Optional[Dict]:
+        key = self.make_key(namespace, user_input)
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = None
+            if conn is not None:
+                row = conn.execute("SELECT action, created FROM intents WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE intents SET last_used = ? WHERE key = ?", (now, key))
+            conn.commit()
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, namespace: str, user_input: str, action: Dict):
+        key = self.make_key(namespace, user_input)
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return
+            conn.execute("INSERT OR REPLACE INTO intents VALUES (?, ?, ?, ?, ?)",
+                         (key, namespace, now, now, json.dumps(action, ensure_ascii=False)))
+            # 提示詞或映射表已改變的舊資料、過期資料，以及超過上限的最久未使用項目
+            conn.execute("DELETE FROM intents WHERE namespace != ? OR created < ?",
+                         (namespace, now - self.ttl))
+            conn.execute(
+                "DELETE FROM intents WHERE key IN (SELECT key FROM intents ORDER BY last_used DESC"
+                " LIMIT -1 OFFSET ?)", (self.max_entries,))
+            conn.commit()
+
+    def clear(self):
+        with self._lock:
+            conn = self._connect()
+            if conn is not None:
+                conn.execute("DELETE FROM intents")
+                conn.commit()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            # 尚未開啟時不為了統計而建立檔案
+            conn = self._conn
+            size = conn.execute("SELECT COUNT(*) FROM intents").fetchone()[0] if conn is not None else 0
+        return {"path": self.path, "size": size, "max_entries": self.max_entries,
+                "ttl": self.ttl, "hits": self.hits, "misses": self.misses}
+
+
+def cache_from_env() -> Optional[IntentCache]:
+    """依 BP_INTENT_CACHE（路徑，"off" 表示停用）、BP_INTENT_CACHE_TTL（秒）、BP_INTENT_CACHE_SIZE 建立快取"""
+    path = os.getenv("BP_INTENT_CACHE", ".bp_intent_cache.sqlite")
+    if path.lower() in ("", "off", "0", "none"):
+        return None
+    return IntentCache(path, ttl=float(os.getenv("BP_INTENT_CACHE_TTL", str(7 * 24 * 3600))),
+                       max_entries=int(os.getenv("BP_INTENT_CACHE_SIZE", "10000")))
@@ -0,0 +1,159 @@
+"""ReAct 流程各階段的耗時追蹤與匯出（Prometheus 文字格式 / JSONL）"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+# 每個階段結束時呼叫 hook(stage, seconds, trace)，可用來接自己的監控系統
+_HOOKS: List[Callable] = []
+
+
+def add_hook(fn: Callable):
+    """註冊階段計時的 hook"""
+    _HOOKS.append(fn)
+
+
+def remove_hook(fn: Callable):
+    if fn in _HOOKS:
+        _HOOKS.remove(fn)
+
+
+class Trace:
+    """一次請求的各階段耗時
+
+    用法：
+        trace = Trace()
+        with trace.span("llm_plan"):
+            ...
+        trace.to_dict()  # {"stages": [{"stage", "seconds", "offset", "error"}, ...], "total_seconds", ...}
+    """
+
+    def __init__(self, **attrs):
+        self.attrs = dict(attrs)
+        self.stages: List[Dict] = []
+        self.started = time.time()
+        self._t0 = time.perf_counter()
+        self.total_seconds = None
+
+    @contextmanager
+    def span(self, stage: str):
+        start = time.perf_counter()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            self.stages.append({"stage": stage, "seconds": seconds,
+                                "offset": start - self._t0, "error": error})
+            for hook in list(_HOOKS):
+                try:
+                    hook(stage, seconds, self)
+                except Exception as e:
+                    print(f"trace hook 失敗: {e}")
+
+    def finish(self, **attrs):
+        self.attrs.update(attrs)
+        self.total_seconds = time.perf_counter() - self._t0
+        return self
+
+    def seconds(self, stage: str) -> float:
+        return sum(s["seconds"] for s in self.stages if s["stage"] == stage)
+
+    def to_dict(self) -> Dict:
+        return {"started": self.started, "total_seconds": self.total_seconds,
+                "attrs": self.attrs, "stages": list(self.stages)}
+
+    def summary(self) -> str:
+        parts = [f"{s['stage']} {s['seconds'] * 1000:.1f}ms" for s in self.stages]
+        total = self.total_seconds if self.total_seconds is not None else time.perf_counter() - self._t0
+        return f"總計 {total * 1000:.1f}ms（" + "，".join(parts) + "）"
+
+
+class JSONLExporter:
+    """每個完成的 trace 寫成 JSONL 的一行"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, trace: Trace):
+        line = json.dumps(trace.to_dict(), ensure_ascii=False)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+class PrometheusExporter:
+    """累計各階段耗時的 histogram，輸出 Prometheus 文字格式
+
+    path 不為 None 時每次匯出都覆寫該檔案（node_exporter textfile collector 的用法）。
+    """
+
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+    METRIC = "bp_react_stage_seconds"
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._hist: Dict[str, Dict] = {}
+        self._errors: Dict[str, int] = {}
+
+    def _observe(self, stage, seconds):
+        h = self._hist.setdefault(stage, {"buckets": [0] * len(self.BUCKETS), "count": 0, "sum": 0.0})
+        for i, bound in enumerate(self.BUCKETS):
+            if seconds <= bound:
+                h["buckets"][i] += 1
+        h["count"] += 1
+        h["sum"] += seconds
+
+    def export(self, trace: Trace):
+        with self._lock:
+            for s in trace.stages:
+                self._observe(s["stage"], s["seconds"])
+                if s["error"]:
+                    self._errors[s["stage"]] = self._errors.get(s["stage"], 0) + 1
+            if trace.total_seconds is not None:
+                self._observe("total", trace.total_seconds)
+            text = self.render_locked()
+        if self.path:
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp, self.path)
+
+    def render(self) -> str:
+        with self._lock:
+            return self.render_locked()
+
+    def render_locked(self) -> str:
+        lines = [f"# HELP {self.METRIC} Latency of each bp_react pipeline stage.",
+                 f"# TYPE {self.METRIC} histogram"]
+        for stage, h in sorted(self._hist.items()):
+            for bound, count in zip(self.BUCKETS, h["buckets"]):
+                lines.append(f'{self.METRIC}_bucket{{stage="{stage}",le="{bound}"}} {count}')
+            lines.append(f'{self.METRIC}_bucket{{stage="{stage}",le="+Inf"}} {h["count"]}')
+            lines.append(f'{self.METRIC}_sum{{stage="{stage}"}} {h["sum"]:.6f}')
+            lines.append(f'{self.METRIC}_count{{stage="{stage}"}} {h["count"]}')
+        lines += ["# HELP bp_react_stage_errors_total Stages that raised an exception.",
+                  "# TYPE bp_react_stage_errors_total counter"]
+        for stage, n in sorted(self._errors.items()):
+            lines.append(f'bp_react_stage_errors_total{{stage="{stage}"}} {n}')
+        return "\n".join(lines) + "\n"
+
+
+def exporter_from_env(spec: Optional[str] = None):
+    """由 "jsonl:路徑" 或 "prometheus[:路徑]" 建立匯出器（預設讀取 BP_TRACE_EXPORT），未設定時回傳 None"""
+    spec = spec if spec is not None else os.getenv("BP_TRACE_EXPORT", "")
+    if not spec:
+        return None
+    kind, _, path = spec.partition(":")
+    kind = kind.strip().lower()
+    if kind == "jsonl":
+        return JSONLExporter(path or "bp_react_traces.jsonl")
+    if kind == "prometheus":
+        return PrometheusExporter(path or None)
+    raise ValueError(f"未知的 trace 匯出格式: {spec}")
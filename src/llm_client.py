@@ -1,10 +1,18 @@
-"""LLM adapter: supports Ollama (requests.post) and OpenAI (openai lib).
-Provides a simple unified interface: generate(messages, model=None)
+"""LLM adapter: supports Ollama (requests) and OpenAI (openai lib).
+Provides a simple unified interface: generate(messages, model=None) and
+stream(messages, model=None), which yields tokens as they arrive.
+
+Ollama calls reuse a pooled HTTP session, have connect/read timeouts, and each
+backend sits behind a circuit breaker so a dead server fails fast instead of
+stalling every request.
 """
 import os
+import threading
+import time
 import requests
 import json
-from typing import List, Dict
+from requests.adapters import HTTPAdapter
+from typing import Dict, Iterator, List, Optional
 
 
 PREFERRED = os.getenv("PREFERRED_LLM", "ollama")
@@ -13,6 +21,15 @@ OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "gemma3:4b")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
 
+# seconds; the read timeout bounds the wait for each streamed chunk, not the whole answer
+CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "3"))
+READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "60"))
+POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "8"))
+
+# circuit breaker: open after N consecutive failures, retry after the cooldown
+BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "3"))
+BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+
 
 # Optional: import openai only if fallback
 try:
@@ -22,54 +39,191 @@ except Exception:
     openai = None
 
 
-
-
-def call_ollama(messages: List[Dict], model: str = None) -> str:
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a backend whose circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """closed -> open after `failures` consecutive errors; after `cooldown`
+    seconds one trial call is let through (half-open) and its outcome decides
+    whether the breaker closes again or stays open."""
+
+    def __init__(self, name: str, failures: int = BREAKER_FAILURES, cooldown: float = BREAKER_COOLDOWN):
+        self.name = name
+        self.failures = failures
+        self.cooldown = cooldown
+        self._errors = 0
+        self._opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.cooldown:
+            return "half-open"
+        return "open"
+
+    def before_call(self):
+        with self._lock:
+            state = self.state
+            if state == "open" or (state == "half-open" and self._trial):
+                raise CircuitOpenError(f"{self.name} circuit open after {self._errors} failures")
+            if state == "half-open":
+                self._trial = True
+
+    def record_success(self):
+        with self._lock:
+            self._errors = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self._errors += 1
+            self._trial = False
+            if self._errors >= self.failures:
+                self._opened_at = time.monotonic()
+
+
+def _make_session(pool_size: int = POOL_SIZE) -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+_default_session = _make_session()
+
+
+def stream_ollama(messages: List[Dict], model: str = None, session: requests.Session = None,
+                  timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)) -> Iterator[str]:
+    """Yield content tokens from Ollama's streamed NDJSON chat response."""
     model = model or OLLAMA_MODEL
     url = f"{OLLAMA_URL}/api/chat"
-    payload = {"model": model, "messages": messages}
-    r = requests.post(url, json=payload, stream = False)
-    
-    output = ""
-    for line in r.iter_lines():
-        
-        if line:
+    payload = {"model": model, "messages": messages, "stream": True}
+    with (session or _default_session).post(url, json=payload, stream=True, timeout=timeout) as r:
+        r.raise_for_status()
+        for line in r.iter_lines():
+            if not line:
+                continue
             obj = json.loads(line)
-            if "message" in obj and "content" in obj["message"]:
-                output += obj["message"]["content"]
-    
-    return output
-    
+            if "error" in obj:
+                raise RuntimeError(f"Ollama error: {obj['error']}")
+            content = obj.get("message", {}).get("content")
+            if content:
+                yield content
+            if obj.get("done"):
+                break
 
 
-def call_openai(messages: List[Dict], model: str = None) -> str:
+def call_ollama(messages: List[Dict], model: str = None) -> str:
+    return "".join(stream_ollama(messages, model=model))
+
+
+def stream_openai(messages: List[Dict], model: str = None) -> Iterator[str]:
     model = model or OPENAI_MODEL
     if openai is None:
         raise RuntimeError("openai package not installed or OPENAI_API_KEY missing")
-        
-    resp = openai.ChatCompletion.create(model=model, messages=messages)
-    
-    return resp.choices[0].message.content
 
+    resp = openai.ChatCompletion.create(model=model, messages=messages, stream=True,
+                                        request_timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+    for chunk in resp:
+        content = chunk.choices[0].delta.get("content")
+        if content:
+            yield content
 
 
+def call_openai(messages: List[Dict], model: str = None) -> str:
+    return "".join(stream_openai(messages, model=model))
 
-class LLMClient:
-    def __init__(self, prefer=PREFERRED):
-        self.prefer = prefer
 
+class TokenStream:
+    """Iterator over the tokens of a single call.
 
-    def generate(self, messages: List[Dict], model: str = None) -> str:
-        
-        if self.prefer == "ollama":
+    ``ttft`` (seconds to the first token) is set when the first token arrives,
+    so concurrent calls on a shared client each see their own timing.
+    """
+
+    def __init__(self, generate):
+        self.ttft: Optional[float] = None
+        self._tokens = generate(self)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        return next(self._tokens)
+
+    def close(self):
+        self._tokens.close()
+
+
+class LLMClient:
+    def __init__(self, prefer=PREFERRED, pool_size: int = POOL_SIZE):
+        self.prefer = prefer
+        self.session = _make_session(pool_size)
+        self.breakers = {"ollama": CircuitBreaker("ollama"), "openai": CircuitBreaker("openai")}
+
+    def _backends(self):
+        # preferred backend first, the other one as fallback
+        return ["openai", "ollama"] if self.prefer == "openai" else ["ollama", "openai"]
+
+    def model_name(self) -> str:
+        """Model the preferred backend answers with (used as part of cache keys)."""
+        return f"openai:{OPENAI_MODEL}" if self.prefer == "openai" else f"ollama:{OLLAMA_MODEL}"
+
+    def _open(self, backend: str, messages: List[Dict], model: Optional[str]) -> Iterator[str]:
+        if backend == "ollama":
+            return stream_ollama(messages, model=model, session=self.session)
+        return stream_openai(messages, model=model)
+
+    def stream(self, messages: List[Dict], model: str = None) -> TokenStream:
+        """Yield tokens as they arrive; the returned stream's ``ttft`` is filled in on the first token.
+
+        Falls back to the next backend only if a backend fails before producing
+        its first token; a failure mid-answer is raised to the caller.
+        """
+        return TokenStream(lambda result: self._stream(messages, model, result))
+
+    def _stream(self, messages: List[Dict], model: Optional[str], result: TokenStream) -> Iterator[str]:
+        start = time.perf_counter()
+        errors = []
+        for backend in self._backends():
+            breaker = self.breakers[backend]
             try:
-                return call_ollama(messages, model=model)
-            except Exception as e:
-                print("Ollama call failed, falling back to OpenAI:", e)
-            return call_openai(messages, model=model)
-        """else:
+                breaker.before_call()
+            except CircuitOpenError as e:
+                errors.append(str(e))
+                continue
+            tokens = self._open(backend, messages, model)
+            started = False
             try:
-                return call_openai(messages, model=model)
-            except Exception:
-                return call_ollama(messages, model=model)
-        """
\ No newline at end of file
+                for token in tokens:
+                    if not started:
+                        started = True
+                        result.ttft = time.perf_counter() - start
+                    yield token
+            except GeneratorExit:
+                # the caller stopped reading; the backend itself was fine
+                breaker.record_success()
+                raise
+            except Exception as e:
+                breaker.record_failure()
+                if started:
+                    raise
+                print(f"{backend} call failed:", e)
+                errors.append(f"{backend}: {e}")
+                continue
+            breaker.record_success()
+            return
+        raise RuntimeError("all LLM backends failed: " + "; ".join(errors))
+
+    def generate(self, messages: List[Dict], model: str = None) -> str:
+        return "".join(self.stream(messages, model=model))
+
+    def stats(self) -> Dict:
+        return {"prefer": self.prefer,
+                "breakers": {name: b.state for name, b in self.breakers.items()}}
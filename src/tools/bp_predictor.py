@@ -1,33 +1,61 @@
-"""BP（Ban/Pick）預測工具"""
+"""BP（Ban/Pick）預測工具
+
+所有函數都可以由多個執行緒同時呼叫：註冊表與映射表只初始化一次，查詢不會修改傳入的參數。
+"""
 import sys
 import os
-import pandas as pd
+import threading
 
 # 添加項目根目錄到路徑
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
 
-from predict import BPpredictor
+from predict import DRAFT_COLUMNS
 from .hero_name_mapper import translate_hero_list, load_hero_names
+from .model_registry import ModelRegistry
+
+# predict_winrate 的 LRU 快取筆數上限（0 表示停用）
+CACHE_SIZE = int(os.getenv("BP_CACHE_SIZE", "4096"))
+
+# 已載入模型的記憶體上限（MB），超過時淘汰最久未使用的模型
+MEMORY_BUDGET_MB = float(os.getenv("BP_MODEL_MEMORY_MB", "1024"))
 
-# 全局模型實例
-_model: BPpredictor = None
+# 額外模型（各聯賽 / 版本）的設定檔，不存在時只使用預設模型
+REGISTRY_CONFIG = os.getenv("BP_MODEL_REGISTRY", "models.json")
 
+# 全局模型註冊表
+_registry: ModelRegistry = None
+_registry_lock = threading.Lock()
 
-def get_model():
-    """獲取或初始化 BP 預測模型"""
-    global _model
-    if _model is None:
-        try:
-            games_df = pd.read_csv("games.csv")
-            hero_df = pd.read_csv("heroes.csv")
-            _model = BPpredictor(games_df, hero_df, modelName="bp_predictor.model")
-        except Exception as e:
-            raise RuntimeError(f"無法載入 BP 預測模型: {e}")
-    return _model
+
+def get_registry():
+    """獲取或初始化模型註冊表"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                registry = ModelRegistry(memory_budget=int(MEMORY_BUDGET_MB * 1024 * 1024), cache_size=CACHE_SIZE)
+                if os.path.exists(REGISTRY_CONFIG):
+                    registry.load_config(REGISTRY_CONFIG)
+                _registry = registry
+    return _registry
+
+
+def get_model(patch_range=None, leagues=None):
+    """獲取（必要時載入）對應 patch 區間 / 聯賽的 BP 預測模型"""
+    try:
+        return get_registry().get(patch_range, leagues)
+    except Exception as e:
+        raise RuntimeError(f"無法載入 BP 預測模型: {e}")
+
+
+def model_info():
+    """各模型的載入時間、常駐記憶體與命中次數"""
+    return get_registry().info()
 
 
 def predict_winrate(team1_picks=None, team2_picks=None, 
-                   team1_bans=None, team2_bans=None, team="blue"):
+                   team1_bans=None, team2_bans=None, team="blue",
+                   patch_range=None, leagues=None):
     """預測勝率
     
     Args:
@@ -36,6 +64,8 @@ def predict_winrate(team1_picks=None, team2_picks=None,
         team1_bans: 藍隊禁用的英雄列表（可以是中文或英文名稱）
         team2_bans: 紅隊禁用的英雄列表（可以是中文或英文名稱）
         team: 要預測的隊伍（"blue" 或 "red"），預設為 "blue"
+        patch_range: 只使用該 patch 區間的 counter/synergy 統計，例如 "15.01-15.04"、"15.05" 或 "current"
+        leagues: 只使用這些聯賽的統計（字串或列表）
         
     Returns:
         勝率（0-1之間的浮點數）
@@ -48,7 +78,7 @@ def predict_winrate(team1_picks=None, team2_picks=None,
     
     # 初始化模型
     try:
-        model = get_model()
+        model = get_model(patch_range, leagues)
     except Exception as e:
         return f"錯誤：無法載入預測模型 - {e}"
     
@@ -61,7 +91,7 @@ def predict_winrate(team1_picks=None, team2_picks=None,
     }
     
     try:
-        winrate = model.predict_winrate(data)
+        winrate = model.stats_view(patch_range, leagues).predict_winrate(data)
         
         # 根據 team 參數返回對應隊伍的勝率
         if team == "red":
@@ -78,7 +108,7 @@ def predict_winrate(team1_picks=None, team2_picks=None,
 
 def recommend_pick(team1_picks=None, team2_picks=None,
                   team1_bans=None, team2_bans=None, 
-                  team="blue", top_k=5):
+                  team="blue", top_k=5, patch_range=None, leagues=None):
     """推薦選擇的英雄
     
     Args:
@@ -88,13 +118,15 @@ def recommend_pick(team1_picks=None, team2_picks=None,
         team2_bans: 紅隊禁用的英雄列表
         team: 要推薦的隊伍（"blue" 或 "red"）
         top_k: 返回前 k 個推薦
+        patch_range: 只使用該 patch 區間的統計（格式同 predict_winrate）
+        leagues: 只使用這些聯賽的統計
         
     Returns:
         推薦的英雄列表，每個元素為 (英雄名稱, 預測勝率)
     """
     try:
         load_hero_names()
-        model = get_model()
+        model = get_model(patch_range, leagues)
     except Exception as e:
         return f"錯誤：{e}"
     
@@ -106,7 +138,7 @@ def recommend_pick(team1_picks=None, team2_picks=None,
     }
     
     try:
-        recommendations = model.recommend_pick(data, team=team, top_k=top_k)
+        recommendations = model.stats_view(patch_range, leagues).recommend_pick(data, team=team, top_k=top_k)
         return recommendations
     except Exception as e:
         return f"錯誤：推薦失敗 - {e}"
@@ -114,7 +146,7 @@ def recommend_pick(team1_picks=None, team2_picks=None,
 
 def recommend_ban(team1_picks=None, team2_picks=None,
                  team1_bans=None, team2_bans=None,
-                 target_team="red", top_k=5):
+                 target_team="red", top_k=5, patch_range=None, leagues=None):
     """推薦禁用的英雄
     
     Args:
@@ -124,13 +156,15 @@ def recommend_ban(team1_picks=None, team2_picks=None,
         team2_bans: 紅隊禁用的英雄列表
         target_team: 要為哪個隊伍推薦 ban（"blue" 或 "red"）
         top_k: 返回前 k 個推薦
+        patch_range: 只使用該 patch 區間的統計（格式同 predict_winrate）
+        leagues: 只使用這些聯賽的統計
         
     Returns:
         推薦的英雄列表，每個元素為 (英雄名稱, 優先級)
     """
     try:
         load_hero_names()
-        model = get_model()
+        model = get_model(patch_range, leagues)
     except Exception as e:
         return f"錯誤：{e}"
     
@@ -142,7 +176,57 @@ def recommend_ban(team1_picks=None, team2_picks=None,
     }
     
     try:
-        recommendations = model.recommend_ban(data, target_team=target_team, top_k=top_k)
+        recommendations = model.stats_view(patch_range, leagues).recommend_ban(data, target_team=target_team, top_k=top_k)
         return recommendations
     except Exception as e:
         return f"錯誤：推薦失敗 - {e}"
+
+
+def translate_drafts(drafts):
+    """翻譯多個陣容的英雄名稱；相同名稱只翻譯一次
+    
+    Args:
+        drafts: 陣容列表，每個元素含 team1_picks / team2_picks / team1_bans / team2_bans（英雄列表）
+        
+    Returns:
+        翻譯後的陣容列表（新的 dict，不修改傳入的資料）
+    """
+    translated = {}
+    
+    def translate(names):
+        result = []
+        for name in names or []:
+            if name not in translated:
+                translated[name] = translate_hero_list([name])
+            result.extend(translated[name])
+        return result
+    
+    return [{col: translate(draft.get(col)) for col in DRAFT_COLUMNS} for draft in drafts]
+
+
+def predict_winrate_batch(drafts, team="blue"):
+    """批量預測勝率（一次編碼、一次模型推論）
+    
+    Args:
+        drafts: 陣容列表，每個元素為含 team1_picks / team2_picks / team1_bans / team2_bans 的 dict
+        team: 要預測的隊伍（"blue" 或 "red"），預設為 "blue"
+        
+    Returns:
+        {"winrates": 每個陣容的勝率列表, "team": team}
+    """
+    try:
+        load_hero_names()
+        model = get_model()
+    except Exception as e:
+        return f"錯誤：{e}"
+    
+    try:
+        winrates = model.predict_winrate_batch(translate_drafts(drafts))
+        if team == "red":
+            winrates = 1 - winrates
+        return {
+            "winrates": [float(w) for w in winrates],
+            "team": team
+        }
+    except Exception as e:
+        return f"錯誤：預測失敗 - {e}"
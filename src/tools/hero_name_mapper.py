@@ -1,15 +1,90 @@
 """英雄名稱映射工具：將中文名稱映射到英文名稱"""
 import json
 import os
-from typing import Dict, Optional
+import threading
+import unicodedata
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
 
 # 載入映射表
 _HERO_MAP: Optional[Dict[str, str]] = None
 _REVERSE_MAP: Optional[Dict[str, str]] = None
+_HERO_FILE: Optional[str] = None
+# 正規化名稱（見 normalize_name）-> 英文名稱
+_NORM_MAP: Optional[Dict[str, str]] = None
+_FUZZY_INDEX: Optional["BKTree"] = None
+_LOAD_LOCK = threading.Lock()
+
+TRANSLATE_CACHE_SIZE = 4096
+
+
+def normalize_name(name: str) -> str:
+    """全形轉半形、不分大小寫並去掉標點與空白，例如 "Kai'Sa"、"kai sa" 都變成 "kaisa" """
+    return "".join(ch for ch in unicodedata.normalize("NFKC", name).casefold() if ch.isalnum())
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein 距離；超過 limit 時提早結束並回傳 limit + 1"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        if min(cur) > limit:
+            return limit + 1
+        prev = cur
+    return prev[-1]
+
+
+class BKTree:
+    """以編輯距離建立的 BK-tree，查詢距離不超過 k 的所有字串"""
+
+    def __init__(self, words):
+        self.root = None
+        for w in words:
+            self.add(w)
+
+    def add(self, word: str):
+        if self.root is None:
+            self.root = (word, {})
+            return
+        node = self.root
+        while True:
+            d = edit_distance(word, node[0], len(word) + len(node[0]))
+            if d == 0:
+                return
+            if d not in node[1]:
+                node[1][d] = (word, {})
+                return
+            node = node[1][d]
+
+    def search(self, word: str, k: int) -> List[Tuple[int, str]]:
+        """回傳 [(距離, 字串)]，依距離排序"""
+        if self.root is None:
+            return []
+        found, stack = [], [self.root]
+        while stack:
+            candidate, children = stack.pop()
+            d = edit_distance(word, candidate, len(word) + len(candidate))
+            if d <= k:
+                found.append((d, candidate))
+            # 三角不等式：只有距離在 [d-k, d+k] 的子樹可能有結果
+            for dist, child in children.items():
+                if d - k <= dist <= d + k:
+                    stack.append(child)
+        return sorted(found)
+
+
+def max_typos(name: str) -> int:
+    """允許的錯字數：短名稱（含大多數兩、三字的中文別名）不做模糊比對，避免誤判"""
+    n = len(name)
+    return 0 if n < 4 else 1 if n < 8 else 2
 
 
 def load_hero_names(file_path: str = "HeroNames.txt") -> Dict[str, str]:
-    """載入英雄名稱映射表
+    """載入英雄名稱映射表（多執行緒同時呼叫時只會載入一次）
     
     Args:
         file_path: 映射表文件路徑
@@ -17,10 +92,16 @@ def load_hero_names(file_path: str = "HeroNames.txt") -> Dict[str, str]:
     Returns:
         中文名稱到英文名稱的映射字典
     """
-    global _HERO_MAP, _REVERSE_MAP
-    
     if _HERO_MAP is not None:
         return _HERO_MAP
+    with _LOAD_LOCK:
+        if _HERO_MAP is not None:
+            return _HERO_MAP
+        return _load(file_path)
+
+
+def _load(file_path: str) -> Dict[str, str]:
+    global _HERO_MAP, _REVERSE_MAP, _HERO_FILE, _NORM_MAP, _FUZZY_INDEX
     
     # 嘗試多個可能的路徑
     possible_paths = [
@@ -41,39 +122,74 @@ def load_hero_names(file_path: str = "HeroNames.txt") -> Dict[str, str]:
     try:
         with open(hero_file, 'r', encoding='utf-8') as f:
             data = json.load(f)
-        
-        # 建立反向映射：中文 -> 英文
-        _HERO_MAP = {}
-        _REVERSE_MAP = {}
-        
-        for english_name, chinese_names in data.items():
-            # 英文名稱本身也可以映射到自己
-            _HERO_MAP[english_name.lower()] = english_name
-            _REVERSE_MAP[english_name] = english_name
-            
-            # 建立所有中文別名到英文名稱的映射
-            if isinstance(chinese_names, list):
-                for chinese_name in chinese_names:
-                    _HERO_MAP[chinese_name] = english_name
-                    _HERO_MAP[chinese_name.lower()] = english_name
-        
-        return _HERO_MAP
     except json.JSONDecodeError as e:
         raise ValueError(f"載入英雄名稱映射失敗: {e}")
+    
+    # 先在區域變數建好，最後才發布；其他執行緒看到 _HERO_MAP 時其餘索引都已就緒
+    # 建立反向映射：中文 -> 英文
+    hero_map = {}
+    reverse_map = {}
+    
+    for english_name, chinese_names in data.items():
+        # 英文名稱本身也可以映射到自己
+        hero_map[english_name.lower()] = english_name
+        # 反向映射：英文 -> 顯示用的中文名稱（第一個別名）
+        if isinstance(chinese_names, list) and chinese_names:
+            reverse_map[english_name] = chinese_names[0]
+        else:
+            reverse_map[english_name] = english_name
+        
+        # 建立所有中文別名到英文名稱的映射
+        if isinstance(chinese_names, list):
+            for chinese_name in chinese_names:
+                hero_map[chinese_name] = english_name
+                hero_map[chinese_name.lower()] = english_name
+    
+    # 正規化索引：找不到完全相同的名稱時 O(1) 查詢，名稱互相衝突時保留先出現的
+    norm_map = {}
+    for key, english_name in hero_map.items():
+        norm_map.setdefault(normalize_name(key), english_name)
+    norm_map.pop("", None)
+    
+    _HERO_FILE = hero_file
+    _REVERSE_MAP = reverse_map
+    _NORM_MAP = norm_map
+    _FUZZY_INDEX = BKTree(norm_map)
+    _resolve.cache_clear()
+    _translate_names.cache_clear()
+    _HERO_MAP = hero_map
+    return _HERO_MAP
+
+
+def hero_names_path() -> Optional[str]:
+    """目前載入的映射表文件路徑（尚未載入時為 None）"""
+    return _HERO_FILE
 
 
-def translate_hero_name(name: str) -> Optional[str]:
+def display_name(english_name: str) -> str:
+    """標準英文名稱對應的中文顯示名稱（映射表中的第一個別名），沒有中文名稱時返回原名"""
+    if _HERO_MAP is None:
+        load_hero_names()
+    return _REVERSE_MAP.get(english_name, english_name)
+
+
+def translate_hero_name(name: str, fuzzy: bool = True) -> Optional[str]:
     """將中文或英文英雄名稱翻譯為標準英文名稱
     
     Args:
         name: 輸入的英雄名稱（中文或英文）
+        fuzzy: 找不到時是否容許少量錯字（如 "Ezreall" -> "Ezreal"）
         
     Returns:
-        標準英文名稱，如果找不到則返回 None
+        標準英文名稱，如果找不到（或錯字比對有多個候選英雄）則返回 None
     """
     if _HERO_MAP is None:
         load_hero_names()
-    
+    return _resolve(name, fuzzy)
+
+
+@lru_cache(maxsize=TRANSLATE_CACHE_SIZE)
+def _resolve(name: str, fuzzy: bool) -> Optional[str]:
     # 先嘗試直接匹配
     if name in _HERO_MAP:
         return _HERO_MAP[name]
@@ -83,23 +199,23 @@ def translate_hero_name(name: str) -> Optional[str]:
     if name_lower in _HERO_MAP:
         return _HERO_MAP[name_lower]
     
-    # 嘗試部分匹配（處理大小寫和空格問題）
-    for key, value in _HERO_MAP.items():
-        if key.lower() == name_lower or key.lower().replace(" ", "") == name_lower.replace(" ", ""):
-            return value
+    # 忽略大小寫、標點與空白（"kaisa" -> "Kai'Sa"、"Lee sin" -> "Lee Sin"）
+    key = normalize_name(name)
+    if key in _NORM_MAP:
+        return _NORM_MAP[key]
     
-    return None
+    if not fuzzy or not key:
+        return None
+    matches = _FUZZY_INDEX.search(key, max_typos(key))
+    if not matches:
+        return None
+    best = matches[0][0]
+    heroes = {_NORM_MAP[word] for d, word in matches if d == best}
+    return heroes.pop() if len(heroes) == 1 else None
 
 
-def translate_hero_list(names: list) -> list:
-    """批量翻譯英雄名稱列表
-    
-    Args:
-        names: 英雄名稱列表（可能包含中文或英文）
-        
-    Returns:
-        翻譯後的英文名稱列表
-    """
+@lru_cache(maxsize=TRANSLATE_CACHE_SIZE)
+def _translate_names(names: tuple) -> tuple:
     translated = []
     for name in names:
         if not name or not name.strip():
@@ -110,4 +226,19 @@ def translate_hero_list(names: list) -> list:
         else:
             # 如果找不到映射，保留原名（可能是已經是英文名稱）
             translated.append(name.strip())
-    return translated
+    return tuple(translated)
+
+
+def translate_hero_list(names: list) -> list:
+    """批量翻譯英雄名稱列表（相同的列表會直接沿用上次結果）
+    
+    Args:
+        names: 英雄名稱列表（可能包含中文或英文）
+        
+    Returns:
+        翻譯後的英文名稱列表
+    """
+    if _HERO_MAP is None:
+        load_hero_names()
+    names = tuple(n if isinstance(n, str) else "" for n in names)
+    return list(_translate_names(names))
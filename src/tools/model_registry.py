@@ -0,0 +1,187 @@
+"""BP 模型註冊表：依 (patch 區間, 聯賽) 選用不同的模型與統計，延遲載入並依記憶體上限淘汰"""
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from predict import BPpredictor, parse_patch_range
+
+# 預設模型：沒有更精確的註冊項目時使用
+DEFAULT_ENTRY = {
+    "model": "bp_predictor.model",
+    "games": "games.csv",
+    "heroes": "heroes.csv",
+    "snapshot": "bp_predictor.snapshot.npz",
+}
+
+
+def _range_key(patch_range):
+    """patch 區間標準化為 (lo, hi)；"current" 等相對區間無法事先比對，直接以字串為鍵"""
+    try:
+        return parse_patch_range(patch_range)
+    except ValueError:
+        return str(patch_range).strip().lower()
+
+
+def _league_key(leagues) -> Optional[str]:
+    """只有指定單一聯賽時才對應到聯賽專屬的模型"""
+    if leagues is None:
+        return None
+    if isinstance(leagues, str):
+        return leagues
+    leagues = list(leagues)
+    return str(leagues[0]) if len(leagues) == 1 else None
+
+
+class _Entry:
+    def __init__(self, key, model, games, heroes, snapshot=None):
+        self.key = key
+        self.model_path = model
+        self.games_path = games
+        self.heroes_path = heroes
+        # 預設快照路徑與模型同名，例如 bp_lck.model -> bp_lck.snapshot.npz
+        self.snapshot_path = snapshot or os.path.splitext(model)[0] + ".snapshot.npz"
+        self.model: Optional[BPpredictor] = None
+        # 同一個模型只由一個執行緒載入，其他要同一模型的執行緒在這裡等候
+        self.load_lock = threading.Lock()
+        self.load_seconds = None
+        self.resident_bytes = 0
+        self.loads = 0
+        self.hits = 0
+
+    def info(self):
+        patch_range, league = self.key
+        return {
+            "patch_range": patch_range,
+            "league": league,
+            "model_path": self.model_path,
+            "loaded": self.model is not None,
+            "loads": self.loads,
+            "hits": self.hits,
+            "load_seconds": self.load_seconds,
+            "resident_bytes": self.resident_bytes,
+        }
+
+
+class ModelRegistry:
+    """以 (patch 區間, 聯賽) 為鍵管理多個 BPpredictor
+
+    第一次用到才載入模型與統計快照；已載入模型的總常駐記憶體超過 memory_budget（bytes）時，
+    淘汰最久未使用的模型（至少保留剛取得的那一個）。查詢順序：
+    (patch 區間, 聯賽) → (不限, 聯賽) → (patch 區間, 不限) → 預設模型。
+    """
+
+    def __init__(self, memory_budget: int = 1 << 30, cache_size: int = BPpredictor.CACHE_SIZE):
+        self.memory_budget = memory_budget
+        self.cache_size = cache_size
+        self._entries: Dict[tuple, _Entry] = {}
+        self._loaded: "OrderedDict[tuple, _Entry]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.evictions = 0
+        self.register(**DEFAULT_ENTRY)
+
+    def register(self, model, games="games.csv", heroes="heroes.csv", snapshot=None,
+                 patch_range=None, league=None):
+        """註冊一個模型；相同鍵重複註冊時取代舊的（已載入的會被卸載）"""
+        key = (_range_key(patch_range), league)
+        with self._lock:
+            self._loaded.pop(key, None)
+            self._entries[key] = _Entry(key, model, games, heroes, snapshot)
+
+    def load_config(self, path: str):
+        """從 JSON 檔註冊模型
+
+        格式為列表，例如：
+            [{"league": "LCK", "model": "bp_lck.model", "games": "games_lck.csv"},
+             {"league": "LPL", "patch_range": "15.01-15.04", "model": "bp_lpl_1501.model"}]
+        相對路徑以設定檔所在目錄為準。模型必須以同一份 games 訓練（特徵維度取決於其中的英雄數）。
+        """
+        base = os.path.dirname(os.path.abspath(path))
+        with open(path, encoding="utf-8") as f:
+            items = json.load(f)
+        for item in items:
+            item = dict(item)
+            for field in ("model", "games", "heroes", "snapshot"):
+                if item.get(field):
+                    item[field] = os.path.join(base, item[field])
+            self.register(**item)
+
+    def resolve(self, patch_range=None, leagues=None) -> _Entry:
+        rng, league = _range_key(patch_range), _league_key(leagues)
+        unbounded = (None, None)
+        for key in ((rng, league), (unbounded, league), (rng, None), (unbounded, None)):
+            if key in self._entries:
+                return self._entries[key]
+        raise KeyError("沒有可用的預設模型")
+
+    def get(self, patch_range=None, leagues=None) -> BPpredictor:
+        """取得對應的模型（必要時載入），並依記憶體上限淘汰其他模型
+
+        載入（讀快照或 CSV）不持有註冊表的鎖，只以該模型自己的 load_lock 保證只載入一次；
+        其他模型的查詢不受影響。註冊表的鎖只在發布與淘汰時短暫持有。
+        """
+        with self._lock:
+            entry = self.resolve(patch_range, leagues)
+            model = entry.model
+            if model is not None:
+                entry.hits += 1
+                self._publish(entry)
+                return model
+        with entry.load_lock:
+            with self._lock:
+                model = entry.model
+                if model is not None:
+                    # 等候期間已由其他執行緒載入
+                    entry.hits += 1
+                    self._publish(entry)
+                    return model
+            start = time.perf_counter()
+            model = BPpredictor.from_csv(entry.games_path, entry.heroes_path,
+                                         modelName=entry.model_path,
+                                         snapshot_path=entry.snapshot_path,
+                                         cache_size=self.cache_size)
+            with self._lock:
+                entry.load_seconds = time.perf_counter() - start
+                entry.loads += 1
+                entry.model = model
+                self._publish(entry)
+            return model
+
+    def _publish(self, entry):
+        # 載入期間被 register 取代的項目不再列入常駐模型
+        if self._entries.get(entry.key) is not entry:
+            return
+        self._loaded[entry.key] = entry
+        self._loaded.move_to_end(entry.key)
+        self._evict(keep=entry.key)
+
+    def _evict(self, keep):
+        # 區間視圖與累積張量會在使用中長大，因此每次都重新估計
+        for entry in self._loaded.values():
+            entry.resident_bytes = entry.model.memory_usage()
+        while self.resident_bytes() > self.memory_budget and len(self._loaded) > 1:
+            key = next(k for k in self._loaded if k != keep)
+            entry = self._loaded.pop(key)
+            entry.model = None
+            entry.resident_bytes = 0
+            self.evictions += 1
+
+    def resident_bytes(self) -> int:
+        return sum(entry.resident_bytes for entry in self._loaded.values())
+
+    def info(self) -> Dict:
+        """各模型的載入時間、常駐大小與命中次數"""
+        with self._lock:
+            models: List[Dict] = [entry.info() for entry in self._entries.values()]
+            return {
+                "memory_budget": self.memory_budget,
+                "resident_bytes": self.resident_bytes(),
+                "loaded": len(self._loaded),
+                "evictions": self.evictions,
+                "models": models,
+            }
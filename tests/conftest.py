@@ -0,0 +1,34 @@
+"""測試共用的 fixture：以 data/games.csv 建立預測器並訓練一個小模型"""
+import contextlib
+import io
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+GAMES_CSV = os.path.join(ROOT, "data", "games.csv")
+
+
+def quiet(fn, *args, **kwargs):
+    # BPpredictor 建構與訓練時會印出英雄列表與評估結果
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(*args, **kwargs)
+
+
+@pytest.fixture(scope="session")
+def games_df():
+    return pd.read_csv(GAMES_CSV).head(3000)
+
+
+@pytest.fixture(scope="session")
+def trained(games_df):
+    """已訓練 40 輪的預測器（不寫出模型與特徵快取）"""
+    pytest.importorskip("xgboost")
+    from predict import BPpredictor
+    model = quiet(BPpredictor, games_df.copy(), pd.DataFrame())
+    quiet(model.train, games_df, num_boost_round=40, cache_dir=None, model_path=None, verbose_eval=False)
+    return model
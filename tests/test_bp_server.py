@@ -0,0 +1,38 @@
+"""HTTP 服務的 patch_range / leagues 路由"""
+import asyncio
+import os
+
+from conftest import ROOT
+from bp_server import BPService
+from src.tools.hero_name_mapper import load_hero_names
+
+DRAFT = {"team1_picks": ["Ahri", "Lee Sin"], "team2_picks": ["Jinx"], "team1_bans": [], "team2_bans": []}
+
+
+def test_requests_use_registry_model_and_stats_view(trained):
+    load_hero_names(os.path.join(ROOT, "data", "HeroNames.txt"))
+    requested = []
+
+    def get_model(patch_range=None, leagues=None):
+        requested.append((patch_range, leagues))
+        return trained
+
+    async def run():
+        service = BPService(get_model, max_wait=0.001)
+        service.batcher.start()
+        try:
+            return await asyncio.gather(
+                service.predict(dict(DRAFT)),
+                service.predict(dict(DRAFT, patch_range="15.02-15.03", leagues="LPL")),
+                service.recommend_pick(dict(DRAFT, team="red", patch_range="15.06", top_k=3)))
+        finally:
+            await service.batcher.stop()
+
+    full, ranged, picks = asyncio.run(run())
+    assert ("15.02-15.03", "LPL") in requested and ("15.06", None) in requested
+    assert full["winrate"] == trained.predict_winrate(DRAFT)
+    view = trained.stats_view("15.02-15.03", "LPL")
+    assert ranged["winrate"] == view.predict_winrate(DRAFT)
+    assert ranged["winrate"] != full["winrate"]
+    expected = trained.stats_view("15.06").recommend_pick(DRAFT, team="red", top_k=3)
+    assert [h for h, _ in picks["recommendations"]] == [h for h, _ in expected]
@@ -0,0 +1,52 @@
+"""前瞻搜尋的置換表"""
+import copy
+
+from conftest import quiet
+from draft_search import DraftSearch
+
+DRAFT = {"team1_picks": ["Ahri"], "team2_picks": ["Jinx"], "team1_bans": [], "team2_bans": []}
+
+
+def test_table_is_invalidated_when_stats_change(trained, games_df):
+    model = copy.deepcopy(trained)
+    engine = DraftSearch(model, beam_width=3)
+    engine.search(DRAFT, depth=2)
+    engine.search(DRAFT, depth=2)
+    assert engine.table_hits > 0
+
+    # 統計改變後，搜尋結果必須與全新的搜尋器相同，不能沿用舊的置換表
+    quiet(model.ingest, games_df.tail(1000).drop(columns=["game_id"], errors="ignore"))
+    assert engine.search(DRAFT, depth=2) == DraftSearch(model, beam_width=3).search(DRAFT, depth=2)
+
+    hits = engine.table_hits
+    engine.model = trained
+    result = engine.search(DRAFT, depth=2)
+    assert engine.table_hits == hits
+    assert result == DraftSearch(trained, beam_width=3).search(DRAFT, depth=2)
+
+
+def _opponent_winrates(model, state, opp_col, hero_ids):
+    # 逐一模擬對手拿到候選英雄，回傳對手的勝率
+    blue_opponent = opp_col == "team1_picks"
+    result = []
+    for hid in hero_ids:
+        child = dict(state)
+        child[opp_col] = state[opp_col] + [model.idx_to_hero[hid]]
+        winrate = model.predict_winrate(child)
+        result.append(winrate if blue_opponent else 1 - winrate)
+    return result
+
+
+def test_ban_ordering_ranks_by_opponent_winrate(trained):
+    engine = DraftSearch(trained, beam_width=8)
+    for col, opp_col in (("team1_bans", "team2_picks"), ("team2_bans", "team1_picks")):
+        legal = engine._legal(DRAFT)
+        threat = _opponent_winrates(trained, DRAFT, opp_col, legal)
+        expected = [legal[i] for i in sorted(range(len(legal)), key=lambda i: threat[i], reverse=True)[:8]]
+        hero_ids, _ = engine._expand(DRAFT, col, exact=False)
+        assert hero_ids == expected
+
+    # 與 recommend_ban 相反：recommend_ban(target_team="red") 依 team1 勝率由高到低，分數最低的才是紅隊最強的英雄
+    hero_ids, _ = engine._expand(DRAFT, "team1_bans", exact=False)
+    scores = dict(trained.recommend_ban(DRAFT, target_team="red", top_k=len(engine._legal(DRAFT))))
+    assert sorted(scores[trained.idx_to_hero[h]] for h in hero_ids) == sorted(scores.values())[:8]
@@ -0,0 +1,52 @@
+"""不經 LLM 的快速意圖解析"""
+import os
+
+import pytest
+
+from conftest import ROOT
+from src.agent.fast_parser import DEFAULT_THRESHOLD, FastIntentParser
+from src.tools.hero_name_mapper import load_hero_names
+
+
+@pytest.fixture(scope="module")
+def parser():
+    return FastIntentParser(load_hero_names(os.path.join(ROOT, "data", "HeroNames.txt")))
+
+
+def test_plain_lineup_is_confident(parser):
+    action, confidence = parser.parse("藍隊選了 Ahri 和 Lee Sin，紅隊選了 Jinx，藍隊勝率多少")
+    assert confidence >= DEFAULT_THRESHOLD
+    assert action["action"] == "predict_winrate"
+    assert action["args"]["team1_picks"] == ["Ahri", "Lee Sin"]
+    assert action["args"]["team2_picks"] == ["Jinx"]
+
+
+@pytest.mark.parametrize("query", [
+    "藍隊沒有選 Ahri，紅隊選了 Jinx，藍隊勝率多少",
+    "紅隊不要選 Jinx，推薦藍隊選誰",
+    "除了 Ahri 以外，藍隊該選誰",
+    "紅隊選的不是 Jinx，藍隊選 Ahri，勝率",
+    "blue picks ahri, red picks jinx, not lee sin, winrate",
+])
+def test_negation_falls_back_to_llm(parser, query):
+    action, confidence = parser.parse(query)
+    assert action is None
+    assert confidence < DEFAULT_THRESHOLD
+
+
+LONG_DRAFT = "藍隊選了妮可、趙信、岩雀、Ahri、Jinx，紅隊選了Lee Sin、Nocturne、Caitlyn、Thresh、Leona，"
+
+
+@pytest.mark.parametrize("query", [
+    "LCK " + LONG_DRAFT + "預測勝率",
+    LONG_DRAFT + "LPL勝率",
+    LONG_DRAFT + "當前版本勝率",
+    LONG_DRAFT + "15.01 的勝率",
+    LONG_DRAFT + "patch 15.03-15.05 winrate",
+])
+def test_patch_and_league_filters_fall_back_to_llm(parser, query):
+    # 名稱很多時覆蓋率仍很高，但快速解析無法帶出 patch_range / leagues，不能默默改用全體統計
+    assert parser.parse(LONG_DRAFT + "藍隊勝率")[1] >= DEFAULT_THRESHOLD
+    action, confidence = parser.parse(query)
+    assert action is None
+    assert confidence < DEFAULT_THRESHOLD
@@ -0,0 +1,24 @@
+"""意圖解析快取"""
+import os
+
+from src.agent.intent_cache import IntentCache, cache_from_env
+
+
+def test_database_is_opened_lazily(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("BP_INTENT_CACHE", raising=False)
+    # bp_react_agent 在 import 時就以 cache_from_env() 建立快取
+    cache = cache_from_env()
+    assert cache is not None and cache.stats()["size"] == 0
+    assert os.listdir(tmp_path) == []
+
+    cache.put("ns", "藍隊 選了 Ahri", {"action": "predict_winrate"})
+    assert os.path.exists(tmp_path / ".bp_intent_cache.sqlite")
+    assert cache.get("ns", "藍隊選了Ahri") == {"action": "predict_winrate"}
+
+
+def test_unusable_path_disables_cache(tmp_path):
+    cache = IntentCache(str(tmp_path / "missing" / "cache.sqlite"))
+    cache.put("ns", "question", {"action": "recommend_pick"})
+    assert cache.get("ns", "question") is None
+    assert cache.stats()["misses"] == 1
@@ -0,0 +1,34 @@
+"""LLM client streaming."""
+import threading
+import time
+
+from src.llm_client import LLMClient
+
+
+def test_ttft_is_per_stream_on_a_shared_client(monkeypatch):
+    delays = {"fast": 0.01, "slow": 0.2}
+
+    def fake_open(self, backend, messages, model):
+        delay = delays[messages[0]["content"]]
+
+        def tokens():
+            time.sleep(delay)
+            yield "a"
+            yield "b"
+        return tokens()
+
+    monkeypatch.setattr(LLMClient, "_open", fake_open)
+    client = LLMClient(prefer="ollama")
+    ttfts = {}
+
+    def run(name):
+        stream = client.stream([{"role": "user", "content": name}])
+        assert "".join(stream) == "ab"
+        ttfts[name] = stream.ttft
+
+    threads = [threading.Thread(target=run, args=(name,)) for name in delays]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert ttfts["fast"] < 0.1 <= ttfts["slow"]
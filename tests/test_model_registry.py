@@ -0,0 +1,49 @@
+"""模型註冊表的延遲載入與並行存取"""
+import threading
+import time
+
+from src.tools import model_registry
+from src.tools.model_registry import ModelRegistry
+
+
+class _FakeModel:
+    def __init__(self, path):
+        self.path = path
+
+    def memory_usage(self):
+        return 1
+
+
+def test_concurrent_get_loads_once_without_blocking_other_models(monkeypatch):
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def from_csv(games, heroes, modelName=None, **kwargs):
+        calls.append(modelName)
+        if modelName == "slow.model":
+            started.set()
+            release.wait(5)
+        return _FakeModel(modelName)
+
+    monkeypatch.setattr(model_registry.BPpredictor, "from_csv", staticmethod(from_csv))
+    registry = ModelRegistry()
+    registry.register("slow.model", league="LCK")
+    registry.register("fast.model", league="LPL")
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get(leagues="LCK"))) for _ in range(4)]
+    for t in threads:
+        t.start()
+    assert started.wait(5)
+    # 慢模型載入期間，其他模型仍可立即取得
+    begin = time.perf_counter()
+    assert registry.get(leagues="LPL").path == "fast.model"
+    assert time.perf_counter() - begin < 1
+    release.set()
+    for t in threads:
+        t.join(5)
+
+    assert calls.count("slow.model") == 1
+    assert len(results) == 4 and len({id(m) for m in results}) == 1
+    slow = next(m for m in registry.info()["models"] if m["model_path"] == "slow.model")
+    assert slow["loads"] == 1 and slow["hits"] == 3
@@ -0,0 +1,54 @@
+"""批次推薦與逐一候選 predict_winrate 的結果一致"""
+import numpy as np
+import pytest
+
+from predict import DRAFT_COLUMNS
+
+
+def reference_recommend(model, data, pick_col, flip):
+    # 原本的做法：每個候選英雄各呼叫一次 predict_winrate
+    taken = {h for c in DRAFT_COLUMNS for h in data[c]}
+    candidates = []
+    for hero in model.idx_to_hero.values():
+        if hero in taken:
+            continue
+        child = {c: list(data[c]) for c in DRAFT_COLUMNS}
+        child[pick_col].append(hero)
+        winrate = model.predict_winrate(child)
+        candidates.append((hero, 1 - winrate if flip else winrate))
+    candidates.sort(key=lambda x: x[1], reverse=True)
+    return candidates
+
+
+def random_drafts(model, n, seed=0):
+    rng = np.random.default_rng(seed)
+    heroes = model.all_heroes
+    drafts = []
+    for _ in range(n):
+        names = [heroes[i] for i in rng.choice(len(heroes), 8, replace=False)]
+        draft = {"team1_picks": names[:2], "team2_picks": names[2:5], "team1_bans": names[5:7], "team2_bans": names[7:]}
+        drafts.append(draft)
+    # 不認識的名稱、空字串與重複的英雄
+    drafts.append({"team1_picks": ["NotAHero", heroes[0]], "team2_picks": [""], "team1_bans": [], "team2_bans": []})
+    drafts.append({"team1_picks": [heroes[1], heroes[1]], "team2_picks": [heroes[2]],
+                   "team1_bans": [heroes[2]], "team2_bans": [heroes[3], heroes[3]]})
+    drafts.append({c: [] for c in DRAFT_COLUMNS})
+    return drafts
+
+
+@pytest.mark.parametrize("team", ["blue", "red"])
+def test_batched_recommend_pick_matches_per_candidate(trained, team):
+    for draft in random_drafts(trained, 10):
+        expected = reference_recommend(trained, draft, "team1_picks" if team == "blue" else "team2_picks",
+                                       flip=team == "red")
+        assert trained.recommend_pick(draft, team=team, top_k=len(expected)) == expected
+
+
+@pytest.mark.parametrize("target_team", ["blue", "red"])
+def test_batched_recommend_ban_matches_per_candidate(trained, target_team):
+    for draft in random_drafts(trained, 10, seed=1):
+        before = {c: list(draft[c]) for c in DRAFT_COLUMNS}
+        expected = reference_recommend(trained, draft, "team1_picks" if target_team == "blue" else "team2_picks",
+                                       flip=target_team == "blue")
+        assert trained.recommend_ban(draft, target_team=target_team, top_k=len(expected)) == expected
+        assert draft == before
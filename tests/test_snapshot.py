@@ -0,0 +1,26 @@
+"""快照存讀與 ingest 去重"""
+import numpy as np
+import pandas as pd
+
+from conftest import quiet
+from predict import BPpredictor
+
+
+def test_reingest_after_snapshot_reload_is_noop(games_df, tmp_path):
+    # 數字型 game_id：快照內存成字串，重新讀入的 CSV 則是整數
+    games = games_df.head(500).copy()
+    games['game_id'] = np.arange(len(games)) + 1000
+    model = quiet(BPpredictor, games.copy(), pd.DataFrame())
+
+    path = str(tmp_path / "snapshot.npz")
+    model.save_snapshot(path)
+    restored = quiet(BPpredictor.from_snapshot, path)
+    before = [m.copy() for m in (restored.counts_vs, restored.wins_vs, restored.counts_sy, restored.wins_sy)]
+
+    assert restored.ingest(games.copy()) == 0
+    # 浮點數欄位（例如含缺值的 CSV）也要視為相同的 id
+    assert restored.ingest(games.astype({'game_id': float})) == 0
+    after = (restored.counts_vs, restored.wins_vs, restored.counts_sy, restored.wins_sy)
+    for a, b in zip(before, after):
+        np.testing.assert_array_equal(a, b)
+    assert restored.game_ids == model.game_ids
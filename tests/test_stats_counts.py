@@ -0,0 +1,65 @@
+"""counter / synergy 統計（bincount 累加）與原本逐對迴圈的結果一致"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import ROOT, quiet
+from predict import BPpredictor
+
+SMALL_CSV = os.path.join(ROOT, "tests", "data", "games_small.csv")
+
+
+def reference_counts(model, games_df):
+    # 原本的做法：逐場、逐對累加
+    n = model.num_heroes
+    counts_vs, wins_vs = np.zeros((n, n), dtype=np.int32), np.zeros((n, n), dtype=np.int32)
+    counts_sy, wins_sy = np.zeros((n, n), dtype=np.int32), np.zeros((n, n), dtype=np.int32)
+    for _, r in games_df.iterrows():
+        t1 = [model.hero_to_idx[h] for h in r['team1_picks'] if h in model.hero_to_idx]
+        t2 = [model.hero_to_idx[h] for h in r['team2_picks'] if h in model.hero_to_idx]
+        t1_win = int(r['label_team1_win'])
+        for a in t1:
+            for b in t2:
+                counts_vs[a, b] += 1
+                wins_vs[a, b] += t1_win
+                counts_vs[b, a] += 1
+                wins_vs[b, a] += 1 - t1_win
+        for team, win in ((t1, t1_win), (t2, 1 - t1_win)):
+            for i in range(len(team)):
+                for j in range(i + 1, len(team)):
+                    a, b = team[i], team[j]
+                    counts_sy[a, b] += 1
+                    wins_sy[a, b] += win
+                    counts_sy[b, a] += 1
+                    wins_sy[b, a] += win
+    return counts_vs, wins_vs, counts_sy, wins_sy
+
+
+@pytest.fixture(scope="module")
+def small_games():
+    return pd.read_csv(SMALL_CSV)
+
+
+def assert_counts_equal(model, games_df):
+    prepared = model._prepare_games(games_df.copy())
+    counts_vs, wins_vs, counts_sy, wins_sy = reference_counts(model, prepared)
+    np.testing.assert_array_equal(model.counts_vs, counts_vs)
+    np.testing.assert_array_equal(model.wins_vs, wins_vs)
+    np.testing.assert_array_equal(model.counts_sy, counts_sy)
+    np.testing.assert_array_equal(model.wins_sy, wins_sy)
+    np.testing.assert_array_equal(model.counter_prob, (wins_vs + 1.0) / (counts_vs + 2.0))
+    np.testing.assert_array_equal(model.synergy_prob, (wins_sy + 1.0) / (counts_sy + 2.0))
+
+
+def test_counts_match_pairwise_loops(small_games):
+    model = quiet(BPpredictor, small_games.copy(), pd.DataFrame())
+    assert_counts_equal(model, small_games)
+
+
+def test_ingest_counts_match_pairwise_loops(small_games):
+    model = quiet(BPpredictor, small_games.iloc[:20].copy(), pd.DataFrame())
+    # 分批加入後與逐對迴圈的結果相同；重疊的列以 game_id 去重
+    quiet(model.ingest, small_games.iloc[10:].copy())
+    assert_counts_equal(model, small_games)
@@ -0,0 +1,89 @@
+import random
+
+import numpy as np
+import pytest
+
+xgb = pytest.importorskip("xgboost")
+
+from tree_ensemble import TreeEnsemble
+
+
+def candidate_batches(model, n, seed=0):
+    """真實的推薦候選批次：隨機 BP 進度下，所有合法英雄加入某一欄位後的特徵"""
+    rng = random.Random(seed)
+    heroes = list(model.hero_to_idx)
+    for _ in range(n):
+        picked = rng.sample(heroes, rng.randint(0, 12))
+        data = {"team1_picks": picked[0:5:2], "team2_picks": picked[1:5:2],
+                "team1_bans": picked[5:9:2], "team2_bans": picked[6:10:2]}
+        col = rng.choice(["team1_picks", "team2_picks", "team1_bans", "team2_bans"])
+        yield model.encode_candidates(data, col, model._legal_candidates(data))
+
+
+def test_predict_is_bitwise_equal_to_booster(trained):
+    trees = TreeEnsemble.from_booster(trained.model)
+    for X in candidate_batches(trained, 50):
+        expected = trained.model.predict(xgb.DMatrix(X))
+        np.testing.assert_array_equal(trees.predict(X), expected)
+        np.testing.assert_array_equal(trees.predict_margin(X),
+                                      trained.model.predict(xgb.DMatrix(X), output_margin=True))
+
+
+def test_candidate_ranking_matches_booster(trained):
+    trees = TreeEnsemble.from_booster(trained.model)
+    for X in candidate_batches(trained, 50, seed=1):
+        expected = trained.model.predict(xgb.DMatrix(X))
+        got = trees.predict(X)
+        assert (np.argsort(-got, kind="stable") == np.argsort(-expected, kind="stable")).all()
+
+
+def test_save_load_roundtrip(trained, tmp_path):
+    trees = TreeEnsemble.from_booster(trained.model)
+    path = tmp_path / "trees.npz"
+    trees.save(path)
+    loaded = TreeEnsemble.load(path)
+    X = next(candidate_batches(trained, 1, seed=2))
+    np.testing.assert_array_equal(loaded.predict(X), trees.predict(X))
+
+
+def test_recommend_uses_fast_path_without_changing_ranking(trained, monkeypatch):
+    data = {"team1_picks": [], "team2_picks": [], "team1_bans": [], "team2_bans": []}
+    fast = trained.recommend_pick(data, team="blue", top_k=20)
+    trained.winrate_cache.clear()
+    monkeypatch.setattr(trained, "FAST_MAX_ROWS", 0)
+    slow = trained.recommend_pick(data, team="blue", top_k=20)
+    assert fast == slow
+
+
+
+def random_drafts(model, n, seed=0):
+    rng = random.Random(seed)
+    heroes = list(model.hero_to_idx)
+    drafts = []
+    for _ in range(n):
+        picked = rng.sample(heroes, rng.randint(1, 20))
+        drafts.append({"team1_picks": picked[0:10:2], "team2_picks": picked[1:10:2],
+                       "team1_bans": picked[10:20:2], "team2_bans": picked[11:20:2]})
+    return drafts
+
+
+def test_fast_and_booster_paths_agree_at_row_limit(trained, monkeypatch):
+    # predict_features 在 FAST_MAX_ROWS 筆以內走 TreeEnsemble，多一筆就改用 Booster；兩邊的分數必須相同
+    limit = trained.FAST_MAX_ROWS
+    drafts = random_drafts(trained, limit + 1, seed=3)
+    X = trained.encode_batch(drafts)
+
+    calls = []
+    tree_predict, booster_predict = trained.trees.predict, trained.model.predict
+    monkeypatch.setattr(trained.trees, "predict", lambda X: calls.append("trees") or tree_predict(X))
+    monkeypatch.setattr(trained.model, "predict", lambda d, **kw: calls.append("booster") or booster_predict(d, **kw))
+
+    at_limit = trained.predict_features(X[:limit])
+    over_limit = trained.predict_features(X)
+    assert calls == ["trees", "booster"]
+    np.testing.assert_array_equal(at_limit, over_limit[:limit])
+
+    # 整批（Booster）與逐筆（TreeEnsemble）的勝率也相同
+    batch = trained.predict_winrate_batch(drafts)
+    trained.winrate_cache.clear()
+    assert list(batch) == [trained.predict_winrate(d) for d in drafts]
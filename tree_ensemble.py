@@ -0,0 +1,164 @@
+"""XGBoost 樹模型的純 NumPy 推論
+
+把 Booster 的所有樹攤平成幾個陣列（feature / threshold / left / right / value），
+單筆或小批次預測時直接在陣列上走訪，省去建立 DMatrix 與 Booster.predict 的固定開銷。
+匯出後的 .npz 可在沒有安裝 xgboost 的環境載入。
+
+用法：python tree_ensemble.py bp_predictor.model bp_predictor.trees.npz
+"""
+import json
+import math
+import sys
+
+import numpy as np
+
+TREES_VERSION = 2  # 匯出格式版本（2：base_margin 改為與 XGBoost 相同的 float32 值）
+
+
+class TreeEnsemble:
+    """攤平的樹模型
+
+    所有樹的節點放在同一組陣列中，left / right 為全域節點索引；葉節點的 left 與 right 指向自己，
+    因此固定走訪 max_depth 次後，每棵樹都會停在葉節點上，不需要逐列判斷。
+    分數依 XGBoost 的方式以 float32 從 base_margin 開始依樹的順序累加，輸出與 Booster.predict 逐位元相同，
+    推薦排序（包括接近平手的候選）也就不會改變。
+    """
+
+    OBJECTIVES = ("binary:logistic", "reg:logistic", "binary:logitraw", "reg:squarederror")
+
+    def __init__(self, feature, threshold, left, right, default_left, value, roots,
+                 base_margin, objective, num_features, max_depth):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.default_left = default_left
+        self.value = value
+        self.roots = roots
+        self.base_margin = np.float32(base_margin)
+        self.objective = objective
+        self.num_features = int(num_features)
+        self.max_depth = int(max_depth)
+
+    @classmethod
+    def from_booster(cls, booster):
+        """從 xgboost.Booster 匯出（只支援單一輸出的 gbtree 數值切分）"""
+        model = json.loads(booster.save_raw('json'))
+        learner = model['learner']
+        objective = learner['objective']['name']
+        if objective not in cls.OBJECTIVES:
+            raise ValueError(f"不支援的 objective: {objective}")
+        gbm = learner['gradient_booster']
+        if gbm['name'] != 'gbtree':
+            raise ValueError(f"不支援的 booster: {gbm['name']}")
+        param = learner['learner_model_param']
+        if int(param.get('num_class', 0)) > 1 or int(param.get('num_target', 1)) > 1:
+            raise ValueError("只支援單一輸出的模型")
+
+        # 與 XGBoost 相同：base_score 為 float32，logistic 類為 -logf(1/p - 1)
+        base_score = np.float32(float(str(param['base_score']).strip('[]')))
+        if objective in ("binary:logistic", "reg:logistic"):
+            one = np.float32(1)
+            base_margin = np.float32(-math.log(float(one / base_score - one)))
+        else:
+            base_margin = base_score
+
+        feature, threshold, left, right, default_left, value, roots = [], [], [], [], [], [], []
+        offset, max_depth = 0, 0
+        for tree in gbm['model']['trees']:
+            if any(tree.get('split_type', [])):
+                raise ValueError("不支援類別型切分")
+            lc = np.asarray(tree['left_children'], dtype=np.int64)
+            rc = np.asarray(tree['right_children'], dtype=np.int64)
+            n = len(lc)
+            nodes = np.arange(n)
+            leaf = lc == -1
+            cond = np.asarray(tree['split_conditions'], dtype=np.float32)
+            feature.append(np.where(leaf, 0, tree['split_indices']).astype(np.int32))
+            threshold.append(np.where(leaf, np.float32(0), cond))
+            left.append(np.where(leaf, nodes, lc) + offset)
+            right.append(np.where(leaf, nodes, rc) + offset)
+            default_left.append(np.asarray(tree['default_left'], dtype=bool))
+            # 葉節點的輸出存在 split_conditions
+            value.append(np.where(leaf, cond, np.float32(0)))
+            roots.append(offset)
+            max_depth = max(max_depth, cls._depth(lc, rc))
+            offset += n
+
+        cat = lambda parts, dtype: np.concatenate(parts).astype(dtype) if parts else np.zeros(0, dtype)
+        return cls(cat(feature, np.int32), cat(threshold, np.float32), cat(left, np.int32),
+                   cat(right, np.int32), cat(default_left, bool), cat(value, np.float32),
+                   np.asarray(roots, dtype=np.int32), base_margin, objective,
+                   int(param['num_feature']), max_depth)
+
+    @staticmethod
+    def _depth(lc, rc):
+        depth, frontier = 0, [0]
+        while True:
+            frontier = [c for i in frontier for c in (lc[i], rc[i]) if c != -1]
+            if not frontier:
+                return depth
+            depth += 1
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.feature, self.threshold, self.left, self.right,
+                                      self.default_left, self.value, self.roots))
+
+    def save(self, path):
+        np.savez(path, version=np.array(TREES_VERSION), feature=self.feature, threshold=self.threshold,
+                 left=self.left, right=self.right, default_left=self.default_left, value=self.value,
+                 roots=self.roots, base_margin=np.array(self.base_margin, dtype=np.float32),
+                 objective=np.array(self.objective), num_features=np.array(self.num_features),
+                 max_depth=np.array(self.max_depth))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as f:
+            if int(f['version']) != TREES_VERSION:
+                raise ValueError(f"樹模型版本不符: {int(f['version'])} != {TREES_VERSION}")
+            return cls(f['feature'], f['threshold'], f['left'], f['right'], f['default_left'],
+                       f['value'], f['roots'], f['base_margin'], str(f['objective']),
+                       int(f['num_features']), int(f['max_depth']))
+
+    def predict_margin(self, X):
+        """(n, F) 特徵矩陣的原始分數（未經 sigmoid），float32"""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        rows = np.arange(len(X))[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), len(self.roots)))
+        for _ in range(self.max_depth):
+            x = X[rows, self.feature[nodes]]
+            go_left = np.where(np.isnan(x), self.default_left[nodes], x < self.threshold[nodes])
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        # 不能用 sum（pairwise 相加、順序不同）：逐棵樹以 float32 累加，捨入才與 XGBoost 一致
+        leaves = self.value[nodes]
+        margin = np.full(len(X), self.base_margin, dtype=np.float32)
+        for j in range(leaves.shape[1]):
+            margin += leaves[:, j]
+        return margin
+
+    def predict(self, X):
+        """與 Booster.predict 逐位元相同的輸出（logistic 類 objective 為機率）"""
+        margin = self.predict_margin(X)
+        if self.objective in ("binary:logistic", "reg:logistic"):
+            # XGBoost 為 1.0f / (1.0f + expf(-x))；expf 以 float64 計算後捨入到 float32 重現
+            one = np.float32(1)
+            with np.errstate(over='ignore'):
+                e = np.exp(-margin.astype(np.float64)).astype(np.float32)
+            margin = one / (one + e)
+        return margin.astype(np.float32)
+
+
+if __name__ == '__main__':
+    import xgboost as xgb
+
+    src, dst = (sys.argv[1:3] + [None, None])[:2]
+    src = src or "bp_predictor.model"
+    dst = dst or "bp_predictor.trees.npz"
+    booster = xgb.Booster()
+    booster.load_model(src)
+    trees = TreeEnsemble.from_booster(booster)
+    trees.save(dst)
+    print(f"已匯出 {len(trees.roots)} 棵樹（{len(trees.feature)} 個節點，最大深度 {trees.max_depth}）到 {dst}")
@@ -0,0 +1,178 @@
+"""XGBoost 勝率模型的超參數搜尋（格點或隨機），多個行程平行訓練
+
+特徵只編碼一次並存成 DMatrix 二進位檔，各行程直接讀取，不需重新編碼或傳送特徵矩陣。
+
+用法：
+    python tune.py --grid '{"eta": [0.03, 0.1], "max_depth": [4, 6, 8]}'
+    python tune.py --space space.json --random 20 --workers 4 --leaderboard leaderboard.csv
+
+搜尋空間為 JSON：列表表示候選值；{"uniform": [lo, hi]}、{"loguniform": [lo, hi]}、
+{"randint": [lo, hi]} 只用於隨機搜尋。num_boost_round 也可以放進搜尋空間。
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from concurrent.futures import ProcessPoolExecutor
+from sklearn.metrics import accuracy_score, roc_auc_score
+from sklearn.model_selection import train_test_split
+
+from predict import BPpredictor
+
+# 子行程各自讀取一次的訓練 / 驗證（提前停止用）/ 測試（排名用）資料
+_dtrain = None
+_deval = None
+_dtest = None
+
+
+def grid_configs(space):
+    """展開格點搜尋的所有組合"""
+    keys = list(space)
+    values = [v if isinstance(v, list) else [v] for v in space.values()]
+    return [dict(zip(keys, combo)) for combo in itertools.product(*values)]
+
+
+def random_configs(space, n, seed=42):
+    """從搜尋空間隨機抽樣 n 組參數"""
+    rng = np.random.default_rng(seed)
+
+    def sample(v):
+        if isinstance(v, list):
+            return v[rng.integers(len(v))]
+        if isinstance(v, dict):
+            (kind, (lo, hi)), = v.items()
+            if kind == "uniform":
+                return float(rng.uniform(lo, hi))
+            if kind == "loguniform":
+                return float(np.exp(rng.uniform(np.log(lo), np.log(hi))))
+            if kind == "randint":
+                return int(rng.integers(lo, hi + 1))
+            raise ValueError(f"未知的分佈: {kind}")
+        return v
+
+    return [{k: sample(v) for k, v in space.items()} for _ in range(n)]
+
+
+def split_cores(n_configs, workers=None, cpus=None):
+    """分配行程數與每個行程的 XGBoost 執行緒數
+
+    hist 在少量執行緒時擴展性較好，因此預設每個行程 2 個執行緒，其餘核心用來平行跑不同組合。
+    """
+    cpus = cpus or os.cpu_count() or 1
+    if workers is None:
+        workers = max(1, cpus // 2)
+    workers = max(1, min(workers, n_configs))
+    return workers, max(1, cpus // workers)
+
+
+def _load_data(train_path, eval_path, test_path):
+    global _dtrain, _deval, _dtest
+    _dtrain = xgb.DMatrix(train_path)
+    _deval = xgb.DMatrix(eval_path)
+    _dtest = xgb.DMatrix(test_path)
+
+
+def _run_config(job):
+    """訓練一組參數（以驗證集提前停止）並回傳測試集 AUC / 準確率與訓練時間"""
+    config, nthread, early_stopping_rounds = job
+    params = {**BPpredictor.TRAIN_PARAMS, **config, "nthread": nthread}
+    num_boost_round = int(params.pop("num_boost_round", 300))
+    start = time.perf_counter()
+    booster = xgb.train(params, _dtrain, num_boost_round=num_boost_round,
+                        evals=[(_deval, 'eval')], early_stopping_rounds=early_stopping_rounds,
+                        verbose_eval=False)
+    best = getattr(booster, 'best_iteration', None) if early_stopping_rounds else None
+    iteration_range = (0, best + 1) if best is not None else (0, 0)
+    prob = booster.predict(_dtest, iteration_range=iteration_range)
+    y = _dtest.get_label()
+    return {
+        "auc": float(roc_auc_score(y, prob)),
+        "accuracy": float(accuracy_score(y, (prob > 0.5).astype(int))),
+        "best_iteration": best,
+        "seconds": time.perf_counter() - start,
+        "params": config,
+    }
+
+
+def sweep(model, games_df, configs, workers=None, early_stopping_rounds=30, test_size=0.2,
+          cache_dir="feature_cache"):
+    """對每組參數訓練並回傳依 AUC 由高到低排序的結果"""
+    games_df = model._prepare_games(games_df.copy())
+    X, y = model.training_features(games_df, cache_dir=cache_dir)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size, random_state=42, stratify=y)
+    # 提前停止用的驗證集另從訓練資料切出（同 BPpredictor.train），測試集只用來排名
+    X_train, X_eval, y_train, y_eval = train_test_split(X_train, y_train, test_size=0.1, random_state=42,
+                                                        stratify=y_train)
+    workers, nthread = split_cores(len(configs), workers)
+    print(f"{len(configs)} 組參數，{workers} 個行程 × {nthread} 執行緒")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        train_path = os.path.join(tmp, "train.buffer")
+        eval_path = os.path.join(tmp, "eval.buffer")
+        test_path = os.path.join(tmp, "test.buffer")
+        xgb.DMatrix(X_train, label=y_train).save_binary(train_path)
+        xgb.DMatrix(X_eval, label=y_eval).save_binary(eval_path)
+        xgb.DMatrix(X_test, label=y_test).save_binary(test_path)
+
+        jobs = [(config, nthread, early_stopping_rounds) for config in configs]
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_load_data,
+                                     initargs=(train_path, eval_path, test_path)) as pool:
+                results = list(pool.map(_run_config, jobs))
+        else:
+            _load_data(train_path, eval_path, test_path)
+            results = [_run_config(job) for job in jobs]
+
+    return sorted(results, key=lambda r: r["auc"], reverse=True)
+
+
+def write_leaderboard(results, path):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["rank", "auc", "accuracy", "best_iteration", "seconds", "params"])
+        for rank, r in enumerate(results, 1):
+            writer.writerow([rank, f"{r['auc']:.5f}", f"{r['accuracy']:.5f}", r["best_iteration"],
+                             f"{r['seconds']:.2f}", json.dumps(r["params"], sort_keys=True)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="XGBoost 超參數搜尋")
+    parser.add_argument("--grid", help="搜尋空間（JSON 字串）")
+    parser.add_argument("--space", help="搜尋空間（JSON 檔案）")
+    parser.add_argument("--random", type=int, default=0, help="隨機搜尋的組數；0 表示格點搜尋")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=None, help="平行行程數，預設為 CPU 數 / 2")
+    parser.add_argument("--early-stopping", type=int, default=30)
+    parser.add_argument("--leaderboard", default="leaderboard.csv")
+    parser.add_argument("--games", default="games.csv")
+    parser.add_argument("--heroes", default="heroes.csv")
+    parser.add_argument("--snapshot", default="bp_predictor.snapshot.npz")
+    args = parser.parse_args()
+
+    if args.space:
+        with open(args.space, encoding="utf-8") as f:
+            space = json.load(f)
+    elif args.grid:
+        space = json.loads(args.grid)
+    else:
+        parser.error("需要 --grid 或 --space")
+    configs = random_configs(space, args.random, args.seed) if args.random else grid_configs(space)
+
+    model = BPpredictor.from_csv(args.games, args.heroes, snapshot_path=args.snapshot)
+    results = sweep(model, pd.read_csv(args.games), configs, workers=args.workers,
+                    early_stopping_rounds=args.early_stopping)
+    write_leaderboard(results, args.leaderboard)
+    for rank, r in enumerate(results[:5], 1):
+        print(f"{rank}. AUC {r['auc']:.4f}  ({r['seconds']:.1f}s)  {json.dumps(r['params'], sort_keys=True)}")
+    print(f"排行榜已寫出到 {args.leaderboard}")
+
+
+if __name__ == '__main__':
+    main()